@@ -0,0 +1,384 @@
+import asyncio
+import logging
+import random
+from time import perf_counter
+
+from .filters import search_query
+from .metrics import COUNT_BUCKETS
+from .metrics import metrics as default_metrics
+from .parsing import is_blocked, parse_page
+from .ratelimit import shared_rate_limiter
+from .records import Ad
+from .throttle import resolve_throttle
+from .transport import USER_AGENT
+
+log = logging.getLogger(__name__)
+
+
+class AsyncResponse(object):
+    """
+    Response of an AsyncTransport, read completely.
+    """
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+
+class AsyncTransport(object):
+    """
+    asyncio counterpart of Transport, on an aiohttp session created on first use. Requires aiohttp.
+
+    Parameters
+    ----------
+    limit : int
+        Maximum number of connections open at the same time.
+    max_per_host : int
+        Maximum number of requests in flight at the same time towards a host.
+    timeout : float or tuple
+        Requests timeout in seconds, either a single value or (connect, read).
+    max_retries : int
+        Number of retries after the first attempt, on connection errors, timeouts and on the
+        status codes listed in retry_statuses.
+    backoff_factor : float
+        Base of the exponential backoff, in seconds, as in Transport.
+    backoff_max : float
+        Upper bound of the backoff, in seconds.
+    retry_statuses : tuple
+        HTTP status codes that are retried.
+    headers : dict
+        Extra headers sent with every request.
+    metrics : Metrics
+        Registry receiving the request metrics, the process-wide one by default.
+    throttle : AdaptiveThrottle
+        Optional per-host rate controller, as for Transport.
+    """
+
+    def __init__(self, limit=100, max_per_host=4, timeout=(10, 30), max_retries=3, backoff_factor=1.0,
+                 backoff_max=60.0, retry_statuses=(500, 502, 503, 504), headers=None, metrics=None, throttle=None):
+        import aiohttp
+        self._aiohttp = aiohttp
+        self.limit = limit
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.retry_statuses = frozenset(retry_statuses)
+        self.headers = {'User-Agent': USER_AGENT}
+        self.headers.update(headers or {})
+        self.metrics = metrics or default_metrics
+        self.throttle = throttle
+        self.session = None
+
+    def _session(self):
+        # The session is bound to the running event loop: it cannot be created in __init__
+        if self.session is None:
+            aiohttp = self._aiohttp
+            if isinstance(self.timeout, tuple):
+                timeout = aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1])
+            else:
+                timeout = aiohttp.ClientTimeout(total=self.timeout)
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.max_per_host)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.headers)
+        return self.session
+
+    def backoff(self, attempt):
+        """
+        :param attempt: number of the failed attempt, starting from 0.
+        :return: the number of seconds to wait before the next attempt (full jitter).
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * 2 ** attempt))
+
+    async def get(self, url, logger=None, **kwargs):
+        """
+        GET an url, retrying with exponential backoff on connection errors, timeouts and
+        retryable status codes.
+        :param kwargs: passed to aiohttp.ClientSession.get.
+        :return: an AsyncResponse. The last response is returned if a retryable status is still
+        received after max_retries.
+        """
+        logger = logger or log
+        session = self._session()
+        errors = (self._aiohttp.ClientError, asyncio.TimeoutError)
+
+        attempt = 0
+        while True:
+            start = perf_counter()
+            try:
+                with self.metrics.timer('fetch_seconds'):
+                    async with session.get(url, **kwargs) as response:
+                        content = await response.read()
+            except errors as exc:
+                self.metrics.inc('request_errors_total')
+                if self.throttle is not None:
+                    self.throttle.record(url)
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning('Request to %s failed (%r). Retrying ...', url, exc)
+            else:
+                self.metrics.inc('requests_total', status=response.status)
+                self.metrics.inc('bytes_downloaded_total', len(content))
+                if self.throttle is not None:
+                    self.throttle.record(url, response.status, perf_counter() - start,
+                                         response.headers.get('Retry-After'))
+                if not self._retryable(response.status) or attempt >= self.max_retries:
+                    return AsyncResponse(url, response.status, response.headers, content)
+                logger.warning('Request to %s returned HTTP %s. Retrying ...', url, response.status)
+
+            self.metrics.inc('retries_total')
+            if self.throttle is not None:
+                await asyncio.sleep(self.throttle.reserve(url))
+            else:
+                await asyncio.sleep(self.backoff(attempt))
+            attempt += 1
+
+    def _retryable(self, status):
+        return status in self.retry_statuses or (self.throttle is not None and status == 429)
+
+    def forget(self, url):
+        # No cache: kept for symmetry with Transport
+        pass
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class AsyncSelogerBase(object):
+    """
+    asyncio counterpart of SelogerBase: get_pages and get_results are async generators. Requests are
+    sent by an AsyncTransport, wait for the process-wide rate limiter without blocking the event loop,
+    and pages are parsed in an executor.
+
+    Parameters
+    ----------
+    search_params : dict
+        The search, as for SelogerBase.
+    **kwargs :
+        base_url, delay, rate_limiter, parser, metrics, throttle, max_block_retries: as for SelogerBase.
+            The rate limiter is shared with the synchronous classes.
+        transport: an AsyncTransport, shared by several searches to share its connections. A transport
+            created by the instance is closed by close().
+        transport_options: dict of AsyncTransport parameters used when no transport is given.
+        executor: the concurrent.futures executor parsing the pages, the default one of the event loop if None.
+    """
+
+    base_url = "http://www.seloger.com/list.htm?"
+    idtt = None
+
+    def __init__(self, search_params=None, **kwargs):
+        self.search_params = dict(search_params or {})
+        self.base_url = kwargs.get('base_url') or self.base_url
+        self.url = self.base_url + "idtt=" + str(self.idtt) + search_query(self.search_params)
+        self.delay = kwargs.get('delay') or 3
+        self.rate_limiter = kwargs.get('rate_limiter') or shared_rate_limiter(self.delay)
+        self.parser = kwargs.get('parser') or 'json'
+        self.metrics = kwargs.get('metrics') or default_metrics
+        self.executor = kwargs.get('executor')
+        self.transport = kwargs.get('transport')
+        self._owns_transport = self.transport is None
+        if self.transport is None:
+            transport_options = dict(kwargs.get('transport_options', {}))
+            transport_options.setdefault('metrics', self.metrics)
+            self.transport = AsyncTransport(**transport_options)
+        throttle = resolve_throttle(kwargs.get('throttle'), self.transport, self.delay, self.metrics)
+        if throttle and self.transport.throttle is None:
+            self.transport.throttle = throttle
+        self.throttle = self.transport.throttle
+        self.max_block_retries = kwargs.get('max_block_retries', 3)
+
+    def page_url(self, page_num):
+        """
+        :return: the url of the result page number page_num.
+        """
+        if page_num == 1:
+            return self.url
+        return self.url + "&LISTING-LISTpg=" + str(page_num)
+
+    async def _wait(self, url):
+        if self.throttle is not None:
+            wait = self.throttle.reserve(url)
+        else:
+            wait = self.rate_limiter.reserve()
+        self.metrics.observe('rate_limiter_wait_seconds', wait)
+        if wait:
+            await asyncio.sleep(wait)
+
+    async def _fetch(self, url):
+        """
+        Same as SelogerBase._fetch.
+        :return: the raw html of the page, or None if it is a robots page.
+        """
+        retries = 0
+        while True:
+            await self._wait(url)
+            content = (await self.transport.get(url)).content
+            if not is_blocked(content):
+                if self.throttle is not None:
+                    self.throttle.valid_page(url)
+                return content
+            self.metrics.inc('blocked_pages_total')
+            if self.throttle is None or retries >= self.max_block_retries:
+                return None
+            retries += 1
+            pause = self.throttle.blocked(url)
+            log.warning('Robots page instead of %s: retrying in %.1f s (%s/%s).', url, pause, retries,
+                        self.max_block_retries)
+
+    def _parse_page(self, content, url):
+        # Runs in the executor
+        with self.metrics.timer('parse_seconds'):
+            page = parse_page(content, self.parser, url=url)
+        self.metrics.inc('pages_total')
+        self.metrics.observe('ads_per_page', len(page.products), buckets=COUNT_BUCKETS)
+        return page
+
+    async def _parse(self, content, url):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._parse_page, content, url)
+
+    async def _get_first_page(self):
+        """
+        :return: the raw html of the first result page, or None if the request failed or the page is a robots one.
+        """
+        log.info("Get pages from base url %s", self.url)
+        try:
+            content = await self._fetch(self.url)
+        except Exception as exc:
+            log.error('Request to %s failed (%r) - They might have detected the crawler, try changing ip.',
+                      self.url, exc)
+            return
+        if content is None:
+            log.error('Invalid result page - They might have detected the crawler, try changing ip.')
+        return content
+
+    async def fetch_page(self, page_num):
+        """
+        Wait for the rate limiter, then get and parse a result page.
+        :return: a Page.
+        :raise ValueError: if a robots page is received instead.
+        """
+        url = self.page_url(page_num)
+        log.debug("Get url %s", url)
+        content = await self._fetch(url)
+        if content is None:
+            raise ValueError(f"Robots page instead of {url} - They might have detected the crawler.")
+        return await self._parse(content, url)
+
+    async def get_pages(self, max_num_pages=None, concurrency=4, ordered=True, first_page=None):
+        """
+        :param max_num_pages: maximum number of pages to be processed, 100 if left empty.
+        :param concurrency: maximum number of pages fetched at the same time, within the rate limiter budget.
+        :param ordered: yield the pages in page order (True) or as they complete (False).
+        :param first_page: the first Page of the search if it was already fetched.
+        :return: an async generator of Page objects.
+        """
+        max_num_pages = max_num_pages or 100
+        results_per_page = 20
+
+        page = first_page
+        if page is None:
+            content = await self._get_first_page()
+            if content is None:
+                return
+            page = await self._parse(content, self.url)
+
+        num_results = page.num_results or 0
+        num_pages = min(num_results // results_per_page + 1, max_num_pages)
+        log.info("The search returned %s results.", num_results)
+        log.info("%s results in %s pages will be processed.", results_per_page * num_pages, num_pages)
+
+        current_page_num = page.page_num or 1
+        page_nums = list(range(current_page_num, num_pages + 1))
+        if page_nums and page_nums[0] == 1:
+            yield page
+            page_nums = page_nums[1:]
+
+        slots = asyncio.Semaphore(concurrency)
+
+        async def fetch(page_num):
+            async with slots:
+                return await self.fetch_page(page_num)
+
+        tasks = [asyncio.ensure_future(fetch(page_num)) for page_num in page_nums]
+        try:
+            for task in (tasks if ordered else asyncio.as_completed(tasks)):
+                yield await task
+        finally:
+            # Stop fetching if the consumer stops early
+            for task in tasks:
+                task.cancel()
+
+    async def get_results(self, max_num_pages=None, **kwargs):
+        """
+        :param max_num_pages: int, if empty it is set to its maximum number 100.
+        :param kwargs:
+            pages: an async generator created with get_pages(). This parameter overrides max_num_pages.
+            concurrency, ordered, first_page: passed to get_pages().
+            as_records: yield Ad records instead of dictionaries.
+        :return: an async generator of dictionaries each corresponding to a property ad.
+        """
+        page_options = {key: kwargs[key] for key in ('concurrency', 'ordered', 'first_page') if key in kwargs}
+        pages = kwargs.get('pages') or self.get_pages(max_num_pages=max_num_pages, **page_options)
+        as_records = kwargs.get('as_records', False)
+        async for page in pages:
+            properties = page.products
+            self.metrics.inc('ads_total', len(properties))
+            for ad in properties:
+                yield Ad.from_dict(ad) if as_records else ad
+
+    async def close(self):
+        """
+        Close the transport if it was created by the instance.
+        """
+        if self._owns_transport:
+            await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class AsyncSeLogerAchat(AsyncSelogerBase):
+    idtt = 2
+
+
+class AsyncSeLogerLocation(AsyncSelogerBase):
+    idtt = 1
+
+
+class AsyncSeLogerLocationTemporaire(AsyncSelogerBase):
+    idtt = 3
+
+
+class AsyncSeLogerLocationViager(AsyncSelogerBase):
+    idtt = 5
+
+
+class AsyncSeLogerInvestissement(AsyncSelogerBase):
+    idtt = 6
+
+
+class AsyncSeLogerLocationVacances(AsyncSelogerBase):
+    idtt = 4
+
+
+class AsyncSeLogerBiensVendus(AsyncSelogerBase):
+    base_url = "http://biens-vendus.seloger.com/list.htm?"
+    idtt = 4
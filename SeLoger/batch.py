@@ -0,0 +1,153 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+log = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def _make_search(job, options):
+    """
+    :param job: a SelogerBase instance, or a (class, search_params) or (class, search_params, kwargs) tuple.
+    :param options: keyword arguments given to the class when the job is a tuple, overridden by the job kwargs.
+    :return: a SelogerBase instance.
+    """
+    if not isinstance(job, tuple):
+        return job
+    search_class, search_params = job[0], job[1]
+    kwargs = dict(options)
+    if len(job) > 2:
+        kwargs.update(job[2])
+    return search_class(search_params, **kwargs)
+
+
+def _crawl_job(job, options, max_num_pages):
+    # Runs in a worker process: the whole job is returned at once
+    return list(_make_search(job, options).get_results(max_num_pages=max_num_pages))
+
+
+class BatchCrawler(object):
+    """
+    Crawl many searches at once and stream their merged results.
+
+    Parameters
+    ----------
+    jobs : list
+        Each job is either a SelogerBase instance or a tuple (class, search_params) or
+        (class, search_params, kwargs), ex. (SeLogerAchat, {'cp': '75015', 'idtypebien': '1'}).
+    workers : int
+        Number of searches crawled at the same time.
+    executor : str
+        'thread' (default) or 'process'. Threads share the process-wide rate limiter and stream
+        the ads as soon as they are parsed. Processes return the ads of a search once it is done
+        and split the politeness budget between them, each using workers times the delay.
+    max_num_pages : int
+        Maximum number of pages per search, 100 if left empty.
+    dedupe : bool
+        Yield only the first occurrence of each idannonce across all the searches.
+    **kwargs :
+        Options given to the classes of tuple jobs (delay, transport_options, ...). In thread mode a
+        single Transport is created and shared by the jobs unless one is given.
+    """
+
+    def __init__(self, jobs, workers=4, executor='thread', max_num_pages=None, dedupe=True, **kwargs):
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"executor must be 'thread' or 'process', not {executor!r}")
+        self.jobs = list(jobs)
+        self.workers = workers
+        self.executor = executor
+        self.max_num_pages = max_num_pages
+        self.dedupe = dedupe
+        self.options = kwargs
+        self.duplicates = 0
+
+    def _unique(self, ads):
+        seen = set()
+        for ad in ads:
+            if self.dedupe:
+                key = ad.get('idannonce')
+                if key in seen:
+                    self.duplicates += 1
+                    continue
+                seen.add(key)
+            yield ad
+
+    def _thread_results(self):
+        options = dict(self.options)
+        if 'transport' not in options:
+            from .transport import Transport
+            options['transport'] = Transport(**options.pop('transport_options', {}))
+
+        results = queue.Queue(maxsize=1000)
+        stop = threading.Event()
+
+        def crawl(job):
+            try:
+                for ad in _make_search(job, options).get_results(max_num_pages=self.max_num_pages):
+                    if stop.is_set():
+                        return
+                    results.put(ad)
+            except Exception:
+                log.exception('Search %r failed', job)
+            finally:
+                results.put(_DONE)
+
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        futures = [executor.submit(crawl, job) for job in self.jobs]
+
+        pending = len(self.jobs)
+        try:
+            while pending:
+                ad = results.get()
+                if ad is _DONE:
+                    pending -= 1
+                else:
+                    yield ad
+        finally:
+            stop.set()
+            for future in futures:
+                if future.cancel():
+                    pending -= 1
+            # Unblock the workers waiting on a full queue
+            while pending:
+                try:
+                    if results.get_nowait() is _DONE:
+                        pending -= 1
+                except queue.Empty:
+                    break
+            executor.shutdown(wait=False)
+
+    def _process_results(self):
+        options = dict(self.options)
+        options['delay'] = (options.get('delay') or 3) * self.workers
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(_crawl_job, job, options, self.max_num_pages): job for job in self.jobs}
+            try:
+                for future in as_completed(futures):
+                    try:
+                        ads = future.result()
+                    except Exception:
+                        log.exception('Search %r failed', futures[future])
+                        continue
+                    yield from ads
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def get_results(self):
+        """
+        :return: a generator of dictionaries each corresponding to a property ad, merged from all the searches.
+        """
+        if self.executor == 'process':
+            return self._unique(self._process_results())
+        return self._unique(self._thread_results())
+
+
+def crawl_many(jobs, **kwargs):
+    """
+    Shortcut for BatchCrawler(jobs, **kwargs).get_results().
+    """
+    return BatchCrawler(jobs, **kwargs).get_results()
@@ -0,0 +1,142 @@
+import json
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from time import time
+
+
+class ResponseCache(object):
+    """
+    Persistent cache of HTTP responses, stored compressed in a SQLite file.
+
+    Parameters
+    ----------
+    path : str
+        Path of the cache file.
+    ttl : float
+        Number of seconds a response is served without contacting the site. Once expired, it is
+        revalidated with If-None-Match/If-Modified-Since when the site sent an ETag or a Last-Modified
+        header, and downloaded again otherwise. None keeps responses fresh forever.
+    max_size : int
+        Maximum total size of the stored (compressed) bodies in bytes. The least recently used
+        responses are evicted beyond it.
+    compress_level : int
+        zlib compression level, 0 stores the bodies uncompressed.
+    """
+
+    def __init__(self, path='seloger-cache.sqlite', ttl=24 * 3600, max_size=512 * 1024 ** 2, compress_level=6):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._db:
+            self._db.execute('''CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status INTEGER,
+                headers TEXT,
+                body BLOB,
+                compressed INTEGER,
+                size INTEGER,
+                stored_at REAL,
+                accessed_at REAL)''')
+            self._db.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)')
+
+    def get(self, url):
+        """
+        :return: a CachedResponse, fresh or not, or None if the url is not in the cache.
+        """
+        with self._lock:
+            row = self._db.execute('SELECT status, headers, body, compressed, stored_at FROM responses WHERE url = ?',
+                                   (url,)).fetchone()
+            if row is None:
+                return None
+            with self._db:
+                self._db.execute('UPDATE responses SET accessed_at = ? WHERE url = ?', (time(), url))
+        status, headers, body, compressed, stored_at = row
+        if compressed:
+            body = zlib.decompress(body)
+        return CachedResponse(url, status, json.loads(headers), body, stored_at)
+
+    def is_fresh(self, cached):
+        return self.ttl is None or time() - cached.stored_at < self.ttl
+
+    def set(self, url, status, headers, body):
+        compressed = self.compress_level > 0
+        data = zlib.compress(body, self.compress_level) if compressed else body
+        now = time()
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                             (url, status, json.dumps(dict(headers)), data, int(compressed), len(data), now, now))
+            self._evict()
+
+    def touch(self, url):
+        """
+        Mark a cached response as fresh again, after a successful revalidation.
+        """
+        now = time()
+        with self._lock, self._db:
+            self._db.execute('UPDATE responses SET stored_at = ?, accessed_at = ? WHERE url = ?', (now, now, url))
+
+    def invalidate(self, url):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM responses WHERE url = ?', (url,))
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM responses')
+
+    def _evict(self):
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_size:
+            return
+        excess = total - self.max_size
+        for url, size in self._db.execute('SELECT url, size FROM responses ORDER BY accessed_at').fetchall():
+            self._db.execute('DELETE FROM responses WHERE url = ?', (url,))
+            excess -= size
+            if excess <= 0:
+                break
+
+    def close(self):
+        self._db.close()
+
+
+class CachedResponse(object):
+    """
+    A response read from a ResponseCache. Has the attributes of requests.Response used by the crawler.
+    """
+
+    from_cache = True
+
+    def __init__(self, url, status_code, headers, content, stored_at):
+        from requests.structures import CaseInsensitiveDict
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.stored_at = stored_at
+        self.encoding = 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, 'replace')
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def validators(self):
+        """
+        :return: the headers of a conditional request revalidating this response.
+        """
+        headers = {}
+        if 'ETag' in self.headers:
+            headers['If-None-Match'] = self.headers['ETag']
+        if 'Last-Modified' in self.headers:
+            headers['If-Modified-Since'] = self.headers['Last-Modified']
+        return headers
+
+    def close(self):
+        pass
@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+from pathlib import Path
+from time import time
+
+
+class Checkpoint(object):
+    """
+    Progress of a multi-page crawl, saved to a small JSON file after every page so that a new
+    instance can resume the search where the previous one stopped.
+
+    The file holds the search url, the nbresults snapshot of the first run, the number of pages to
+    crawl, the pages completed and pending and the ids of the ads already yielded. A page is
+    completed once all its ads have been consumed. The ids of the ads are recorded as they are
+    yielded, so that a crawl stopped in the middle of a page does not yield them again on resume.
+
+    Parameters
+    ----------
+    path : str
+        Path of the state file. Use one file per search.
+    save_interval : float
+        The ads yielded within a page are saved at most every save_interval seconds, and when the
+        crawl stops.
+    """
+
+    def __init__(self, path, save_interval=1.0):
+        self.path = Path(path)
+        self.save_interval = save_interval
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+        self.state = {}
+        if self.path.is_file():
+            self.state = json.loads(self.path.read_text())
+        self._completed = set(self.state.get('completed_pages', []))
+        self._ids = set(self.state.get('ids', []))
+
+    def start(self, url, num_results, num_pages):
+        """
+        Start a crawl, or resume it if the checkpoint is for the same search.
+        :return: True if a previous crawl of the search is resumed.
+        """
+        with self._lock:
+            resumed = self.state.get('url') == url and not self.state.get('done')
+            if not resumed:
+                self._completed = set()
+                self._ids = set()
+                self.state = {'url': url, 'num_results': num_results, 'started_at': time()}
+            self.state['num_pages'] = num_pages
+            self.state['last_num_results'] = num_results
+            self._save()
+        return resumed
+
+    @property
+    def num_results(self):
+        return self.state.get('num_results')
+
+    @property
+    def completed_pages(self):
+        return set(self._completed)
+
+    def pending_pages(self, num_pages=None):
+        """
+        :return: the sorted list of the pages left to crawl.
+        """
+        num_pages = num_pages or self.state.get('num_pages') or 0
+        return [n for n in range(1, num_pages + 1) if n not in self._completed]
+
+    def is_completed(self, page_num):
+        return page_num in self._completed
+
+    def seen(self, idannonce):
+        """
+        :return: True if the ad was already yielded by this crawl, before or after a resume.
+        """
+        return str(idannonce) in self._ids
+
+    def record(self, idannonce):
+        """
+        Record an ad as yielded. The checkpoint is saved if it was not for save_interval seconds.
+        """
+        with self._lock:
+            self._ids.add(str(idannonce))
+            if time() - self._saved_at >= self.save_interval:
+                self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def complete_page(self, page_num, ids=()):
+        """
+        Mark a page as done, with the ids of the ads it yielded, and save the checkpoint.
+        """
+        with self._lock:
+            self._completed.add(page_num)
+            self._ids.update(str(i) for i in ids)
+            self.state['last_completed_page'] = max(self._completed)
+            self._save()
+
+    def finish(self):
+        """
+        Mark the crawl as complete: the next start() begins a new crawl.
+        """
+        with self._lock:
+            self.state['done'] = True
+            self._save()
+
+    def _save(self):
+        self.state['completed_pages'] = sorted(self._completed)
+        self.state['pending_pages'] = self.pending_pages()
+        self.state['ids'] = sorted(self._ids)
+        self.state['updated_at'] = self._saved_at = time()
+        part = self.path.with_name(self.path.name + '.part')
+        part.write_text(json.dumps(self.state))
+        os.replace(part, self.path)
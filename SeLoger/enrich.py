@@ -0,0 +1,268 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from html import unescape
+from pathlib import Path
+from time import time
+
+from .metrics import metrics as default_metrics
+from .parsing import _as_bytes, is_blocked
+from .ratelimit import shared_rate_limiter
+from .throttle import resolve_throttle
+
+log = logging.getLogger(__name__)
+
+DETAIL_URL = 'https://www.seloger.com/annonces/{idannonce}.htm'
+
+# Fields of the listing whose change means the detail page has to be fetched again
+FINGERPRINT_FIELDS = ('prix', 'surface', 'nb_pieces', 'nb_chambres', 'nb_photos', 'dtmodif')
+
+_JSON_LD = re.compile(rb'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.IGNORECASE | re.DOTALL)
+_META_DESCRIPTION = re.compile(rb'<meta[^>]*name=["\']description["\'][^>]*content=["\']([^"\']*)', re.IGNORECASE)
+_ENERGY_CLASS = re.compile(rb'(?:classe|class)[\s-]*(?:&eacute;|\xc3\xa9|e)nergi\w*\W{0,20}([A-G])\b', re.IGNORECASE)
+
+
+def fingerprint(ad, fields=FINGERPRINT_FIELDS):
+    """
+    :return: a short hash of the fields of the ad that, when they change, call for a new detail page.
+    """
+    values = json.dumps([ad.get(field) for field in fields], default=str)
+    return hashlib.sha1(values.encode('utf-8')).hexdigest()[:16]
+
+
+def parse_detail(content):
+    """
+    Default parser of the detail page of an ad: the description, photos and title of the JSON-LD
+    blocks of the page (or of its meta description) and the energy rating.
+    :param content: the raw html of the page (bytes or str).
+    :return: a dictionary of the fields found.
+    """
+    content = _as_bytes(content)
+    fields = {}
+    for block in _JSON_LD.findall(content):
+        try:
+            data = json.loads(block)
+        except ValueError:
+            continue
+        for item in data if isinstance(data, list) else [data]:
+            if not isinstance(item, dict):
+                continue
+            if item.get('description'):
+                fields.setdefault('description', item['description'])
+            if item.get('name'):
+                fields.setdefault('titre', item['name'])
+            images = item.get('image')
+            if images:
+                fields.setdefault('photos', images if isinstance(images, list) else [images])
+
+    if 'description' not in fields:
+        description = _META_DESCRIPTION.search(content)
+        if description:
+            fields['description'] = unescape(description.group(1).decode('utf-8', 'replace'))
+
+    energy_class = _ENERGY_CLASS.search(content)
+    if energy_class:
+        fields['dpe'] = energy_class.group(1).decode('ascii').upper()
+    return fields
+
+
+class DetailCache(object):
+    """
+    Persistent cache of the fields extracted from the detail pages, by idannonce, with the fingerprint
+    of the listing they were fetched for. Stored in SQLite.
+
+    Parameters
+    ----------
+    path : str
+        Path of the cache file.
+    """
+
+    def __init__(self, path='seloger-details.sqlite'):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._db:
+            self._db.execute('''CREATE TABLE IF NOT EXISTS details (
+                idannonce TEXT PRIMARY KEY,
+                fingerprint TEXT,
+                fields TEXT,
+                fetched_at REAL)''')
+
+    def get(self, idannonce):
+        """
+        :return: a (fingerprint, fields) tuple, or None if the ad was never enriched.
+        """
+        with self._lock:
+            row = self._db.execute('SELECT fingerprint, fields FROM details WHERE idannonce = ?',
+                                   (str(idannonce),)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def set(self, idannonce, ad_fingerprint, fields):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO details VALUES (?, ?, ?, ?)',
+                             (str(idannonce), ad_fingerprint, json.dumps(fields, ensure_ascii=False), time()))
+
+    def invalidate(self, idannonce):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM details WHERE idannonce = ?', (str(idannonce),))
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM details').fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+
+class Enricher(object):
+    """
+    Add the fields of the detail page of each ad to a stream of ads, ex. the one of get_results().
+
+    Detail pages are fetched by a pool of threads while the stream is consumed, within a window of
+    ads ahead of the consumer, and ads are yielded in their original order. Requests go through the
+    Transport, which limits the requests per host, and wait for the throttle, or the rate limiter
+    without throttle. Ads whose fields
+    are cached for an unchanged listing are not fetched again.
+
+    Parameters
+    ----------
+    transport : Transport
+        The transport of the requests, the process-wide one by default.
+    cache : DetailCache
+        A DetailCache (or the path of one). Without cache, every ad is fetched.
+    workers : int
+        Number of detail pages fetched at the same time.
+    window : int
+        Maximum number of ads read ahead of the consumer, 4 times workers by default.
+    url_template : str
+        Url of the detail page, formatted with the ad fields. The 'permalien' field of the ad is used
+        when it is present.
+    parse : callable
+        Function of the raw html of a detail page returning the dictionary of fields to add.
+    delay : float
+        Number of seconds between requests, as for the SeLoger classes.
+    rate_limiter : TokenBucket
+        Used instead of the process-wide one.
+    throttle : AdaptiveThrottle
+        Per-host rate controller used instead of the rate limiter (True for the process-wide one), so that
+        detail pages respect its pauses and rates. The throttle of the transport is used if it has one.
+    metrics : Metrics
+        Registry of the enrichment metrics, the process-wide one by default.
+    """
+
+    def __init__(self, transport=None, cache=None, workers=4, window=None, url_template=DETAIL_URL,
+                 parse=parse_detail, delay=3, rate_limiter=None, throttle=None, metrics=None):
+        if transport is None:
+            from .transport import default_transport
+            transport = default_transport()
+        self.transport = transport
+        if cache is not None and not isinstance(cache, DetailCache):
+            cache = DetailCache(cache)
+        self.cache = cache
+        self.workers = workers
+        self.window = window or 4 * workers
+        self.url_template = url_template
+        self.parse = parse
+        self.rate_limiter = rate_limiter or shared_rate_limiter(delay)
+        self.metrics = metrics or default_metrics
+        self.throttle = resolve_throttle(throttle, transport, delay, self.metrics)
+
+    def detail_url(self, ad):
+        return ad.get('permalien') or self.url_template.format(**ad)
+
+    def _wait(self, url):
+        if self.throttle is not None:
+            waited = self.throttle.acquire(url)
+        else:
+            waited = self.rate_limiter.acquire()
+        self.metrics.observe('rate_limiter_wait_seconds', waited)
+
+    def fetch(self, ad):
+        """
+        Get and parse the detail page of an ad.
+        :return: the dictionary of its fields, or None if the page could not be fetched.
+        """
+        url = None
+        try:
+            url = self.detail_url(ad)
+            response = self.transport.get(url, wait=lambda: self._wait(url))
+        except Exception as exc:
+            log.warning('Detail page %s of ad %s failed (%s).', url, ad.get('idannonce'), exc)
+            return None
+        if is_blocked(response.content):
+            log.warning('Robots page instead of the detail page %s.', url)
+            self.metrics.inc('blocked_pages_total')
+            self.transport.forget(url)
+            if self.throttle is not None:
+                # Pauses the host for the other detail pages and result pages too
+                self.throttle.blocked(url)
+            return None
+        if response.status_code != 200:
+            log.warning('Invalid detail page %s (HTTP %s).', url, response.status_code)
+            self.transport.forget(url)
+            return None
+        if self.throttle is not None:
+            self.throttle.valid_page(url)
+        try:
+            with self.metrics.timer('detail_parse_seconds'):
+                return self.parse(response.content)
+        except Exception as exc:
+            log.warning('Could not parse the detail page %s (%s).', url, exc)
+            return None
+
+    def _cached(self, ad, ad_fingerprint):
+        if self.cache is None:
+            return None
+        cached = self.cache.get(ad.get('idannonce'))
+        if cached is None or cached[0] != ad_fingerprint:
+            return None
+        return cached[1]
+
+    def enrich(self, ads):
+        """
+        :param ads: an iterable of ad dictionaries.
+        :return: a generator of the ads, in the same order, with the fields of their detail page added.
+        Fields already in the ad are not overwritten. Ads whose detail page failed are yielded unchanged.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        pending = deque()
+        try:
+            for ad in ads:
+                ad_fingerprint = fingerprint(ad)
+                fields = self._cached(ad, ad_fingerprint)
+                if fields is not None:
+                    self.metrics.inc('detail_cache_hits_total')
+                    pending.append((ad, ad_fingerprint, fields))
+                else:
+                    pending.append((ad, ad_fingerprint, executor.submit(self.fetch, ad)))
+                while len(pending) >= self.window:
+                    yield self._merge(*pending.popleft())
+            while pending:
+                yield self._merge(*pending.popleft())
+        finally:
+            # Stop fetching if the consumer stops early
+            for _, _, fields in pending:
+                if not isinstance(fields, dict):
+                    fields.cancel()
+            executor.shutdown(wait=False)
+
+    def _merge(self, ad, ad_fingerprint, fields):
+        if not isinstance(fields, dict):
+            fields = fields.result()
+            if fields is None:
+                self.metrics.inc('detail_errors_total')
+                return ad
+            self.metrics.inc('details_total')
+            if self.cache is not None:
+                self.cache.set(ad.get('idannonce'), ad_fingerprint, fields)
+        merged = dict(ad)
+        for key, value in fields.items():
+            merged.setdefault(key, value)
+        return merged
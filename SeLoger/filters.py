@@ -0,0 +1,288 @@
+import re
+from functools import lru_cache
+from urllib.parse import quote
+
+# Catalogue of the search filters of seloger.com, by group
+SORT_BY = {
+    'Sorting options': {
+        'url_key': 'tri',
+        'value': {
+            'By selection': 'initial',
+            'By price': 'a_px',
+            'By surface': 'a_surface',
+            'By location': 'a_ville',
+            'By date': 'd_dt_crea'
+        },
+        'example': {'description': 'sort the ads by creation date:',
+                    'url_key': "{'tri': 'd_dt_crea'}"}
+    }
+}
+
+PROPERTY_TYPE = {
+    'Property type': {
+        'url_key': 'idtypebien',
+        'value': {
+            'Apartment': '1',
+            'House': '2',
+            'Car park': '3',
+            'Shop': '6',
+            'Commercial': '7',
+            'Office': '8',
+            'Lofts - Ateliers - Land': '9',
+            'Various': '10',
+            'Property': '11',
+            'Building': '12',
+            'Castle': '13',
+            'Hotels Particuliers': '14'
+        },
+        'example': {'description': 'look for houses and apartments only:',
+                    'url_key': "{'idtypebien': '1,2'}"}
+    },
+    'Building age': {
+        'url_key': 'naturebien',
+        'value': {
+            'old': '1',
+            'New': '2',
+            'In construction': '4'
+        },
+        'example': {'description': 'look for new construction only:',
+                    'url_key': "{'naturebien': '2'}"}
+
+    }
+}
+
+KITCHEN_AND_HEATING_TYPE = {
+    'Kitchen type': {
+        'url_key': 'idtypecuisine',
+        'value': {
+            'Separated kitchen': '3',
+            'Open kitchen': '2',
+            'Kitchenette': '5',
+            'Fitted kitchen': '9'
+        },
+        'example': {'description': 'an open kitchen:',
+                    'url_key': "{'idtypecuisine': '2'}"}
+    },
+    'Heating type': {
+        'url_key': 'idtypechauffage',
+        'value': {
+            'individuel': '8192',
+            'central': '4096',
+            'electrique': '2048',
+            'gaz': '512',
+            'fuel': '1024',
+            'radiateur': '128',
+            'sol': '256'
+        },
+        'example': {'description': 'centralised underfloor heating:',
+                    'url_key': "{'idtypechauffage': '4096, 256'}"}
+    }
+}
+
+AMENITIES_AND_AD_FILTERS = {
+    'Filters': {
+        'Ad options': {
+            'Ad with video': {'url_key': 'video', 'value': '1'},
+            'Ad with virtual visit': {'url_key': 'vv', 'value': '1'},
+            'Ad with photos': {'url_key': 'photo', 'value': '15'},
+            'Exclusive': {'url_key': 'si_mandatexclusif', 'value': '1'},
+            'Price has changed': {'url_key': 'siBaissePrix', 'value': '1'}
+        },
+        'Amentities': {
+            'Last floor': {'url_key': 'si_dernieretage', 'value': '1'},
+            'Separated toilets': {'url_key': 'si_toilettes_separees', 'value': '1'},
+            'Bath tube': {'url_key': 'nb_salles_de_bainsmin', 'value': '1'},
+            'Bathroom': {'url_key': 'nb_salles_deaumin', 'value': '1'},
+            'Separate entrance': {'url_key': 'si_entree', 'value': '1'},
+            'Living room': {'url_key': 'si_sejour', 'value': '1'},
+            'Dining room': {'url_key': 'si_salle_a_manger', 'value': '1'},
+            'Terrace': {'url_key': 'si_terrasse', 'value': '1'},
+            'Balcony': {'url_key': 'nb_balconsmin', 'value': 'Insert number as a string'},
+            'Car park': {'url_key': 'si_parkings', 'value': '1'},
+            'Car box': {'url_key': 'si_boxes', 'value': '1'},
+            'Cellar': {'url_key': 'si_cave', 'value': '1'},
+            'Fire place': {'url_key': 'si_cheminee', 'value': '1'},
+            'Wooden floor': {'url_key': 'si_parquet', 'value': '1'},
+            'Lift': {'url_key': 'si_ascenseur', 'value': '1'},
+            'Swimming pool': {'url_key': 'si_piscine', 'value': '1'},
+            'Built-in wardrobe': {'url_key': 'si_placards', 'value': '1'},
+            'Interphone': {'url_key': 'si_interphone', 'value': '1'},
+            'Security code': {'url_key': 'si_digicode', 'value': '1'},
+            'Concierge': {'url_key': 'si_gardien', 'value': '1'},
+            'Disable access': {'url_key': 'si_handicape', 'value': '1'},
+            'Alarm': {'url_key': 'si_alarme', 'value': '1'},
+            'Without vis-a-vis': {'url_key': 'si_visavis', 'value': '1'},
+            'Nice view': {'url_key': 'si_vue', 'value': '1'},
+            'South facing': {'url_key': 'si_sud', 'value': '1'},
+            'Air conditioning': {'url_key': 'si_climatisation', 'value': '1'}
+        }
+
+    },
+    'example': {'description': 'add a lift, a parking and the air conditioning.',
+                'url_key': "{'si_ascenseur': '1', 'si_climatisation': '1', 'si_parkings': '1'}"}
+
+}
+
+PROPERTY_SIZE = {
+    'Filters': {
+        'Property size': {
+            'Minimum price': {'url_key': 'pxmin', 'value': 'Insert number as a string'},
+            'Maximum price': {'url_key': 'pxmax', 'value': 'Insert number as a string'},
+            'Minimum surface': {'url_key': 'surfacemin', 'value': 'Insert number as a string'},
+            'Maximum surface': {'url_key': 'surfacemax', 'value': 'Insert number as a string'},
+            'Number of rooms': {'url_key': 'nb_pieces', 'value': 'Insert number as a string'},
+            'Lower floor': {'url_key': 'etagemin', 'value': 'Insert number as a string'},
+            'Higher floor': {'url_key': 'etagemax', 'value': 'Insert number as a string'},
+            'Number fo bedrooms': {'url_key': 'nb_chambres', 'value': 'Insert number as a string'},
+            'Minimum land surface': {'url_key': 'surf_terrainmin', 'value': 'Insert number as a string'},
+            'Maximum land surface': {'url_key': 'surf_terrainmax', 'value': 'Insert number as a string'}
+        }
+    },
+    'example': {'description': 'look for a minimum surface of 70 sqm, 2 bedrooms for maximum 500 000 euros:',
+                'url_key': "{'surfacemin': '70', 'nb_chambres': '2', 'pxmax': '500000'}"}
+
+}
+
+FILTERS = {
+    'sort_by': SORT_BY,
+    'property_type': PROPERTY_TYPE,
+    'property_size': PROPERTY_SIZE,
+    'kitchen_and_heating_type': KITCHEN_AND_HEATING_TYPE,
+    'amenities_and_ad_filters': AMENITIES_AND_AD_FILTERS,
+}
+
+
+def _url_keys():
+    # url key: the accepted values of the enumerations, None for numbers
+    url_keys = {}
+    for group in (SORT_BY, PROPERTY_TYPE, KITCHEN_AND_HEATING_TYPE):
+        for option in group.values():
+            url_keys[option['url_key']] = frozenset(option['value'].values())
+    # The values of the other filters are examples ('1' for a flag, '15' photos, 1 bathroom minimum):
+    # any number is accepted
+    for group in (PROPERTY_SIZE, AMENITIES_AND_AD_FILTERS):
+        for options in group['Filters'].values():
+            for option in options.values():
+                url_keys[option['url_key']] = None
+    return url_keys
+
+
+# Precomputed once: the search filters known to the catalogue and their values
+URL_KEYS = _url_keys()
+
+_NUMBERS = re.compile(r'^-?\d+(\.\d+)?(,-?\d+(\.\d+)?)*$')
+_UNSAFE = re.compile(r'[&=#?\s]')
+
+
+def _validate(key, value):
+    if not key or _UNSAFE.search(key):
+        raise ValueError(f"Invalid search filter {key!r}")
+    # Lists of values are comma-separated, without spaces: '4096, 256' is sent as '4096,256'
+    value = ','.join(part.strip() for part in value.split(','))
+    if key not in URL_KEYS:
+        # Location and other filters missing from the catalogue are url-encoded ('Saint Denis' is sent as
+        # 'Saint%20Denis'). '%' and '+' are kept, so that values already encoded are sent as they are.
+        return quote(value, safe=',%+')
+    accepted = URL_KEYS[key]
+    if accepted is None:
+        if not _NUMBERS.match(value):
+            raise ValueError(f"Invalid value {value!r} for the search filter {key!r}: expected a number")
+    elif not set(value.split(',')) <= accepted:
+        raise ValueError(f"Invalid value {value!r} for the search filter {key!r}: expected among "
+                         f"{', '.join(sorted(accepted))}")
+    return value
+
+
+@lru_cache(maxsize=1024)
+def _query(items):
+    return ''.join('&' + key + '=' + _validate(key, value) for key, value in items)
+
+
+def search_query(search_params: dict):
+    """
+    Build the query string of a search, ex. '&cp=75015&tri=d_dt_crea'. The values of the filters of
+    the catalogue are checked, numbers are accepted as int or float too, and the values of the other
+    filters are url-encoded. Results are cached.
+    :raise ValueError: if a filter or a value is invalid.
+    """
+    return _query(tuple((str(key), str(value)) for key, value in search_params.items()))
+
+
+# Former name
+create_param_url = search_query
+
+
+def _print_type_options(type_options):
+    print("\n")
+    for option_title, option_value in type_options.items():
+        print("\t" + option_title + ":")
+        print("\t-----")
+        print("\t\t URL key:", "'" + option_value['url_key'] + "'")
+        print("\t\t URL key options:")
+        for option, option_api_value in option_value['value'].items():
+            print("\t\t\t* " + option + ":", "'" + option_api_value + "'")
+        search_example = option_value['example']
+        print("\n")
+        print("\t\tIf you want to", search_example['description'], search_example['url_key'])
+        print("\n")
+
+
+def _print_binary_and_numeric_options(search_options):
+    print("\n")
+    for option_title, option_value in search_options['Filters'].items():
+        print("\t" + option_title + ":")
+        print("\t-----")
+        for option, option_api_value in option_value.items():
+            print("\t\t\t* " + option + ":",
+                  "\t{'" + option_api_value['url_key'] + "': " + "'" + option_api_value['value'] + "'}")
+    search_example = search_options['example']
+    print("\n")
+    print("\t\tIf you want to", search_example['description'], search_example['url_key'])
+    print("\n")
+
+
+def _print_options(search_options):
+    if 'Filters' in search_options:
+        _print_binary_and_numeric_options(search_options)
+    else:
+        _print_type_options(search_options)
+
+
+SELECTION_LABELS = {
+    '1': 'sort_by',
+    '2': 'property_type',
+    '3': 'property_size',
+    '4': 'kitchen_and_heating_type',
+    '5': 'amenities_and_ad_filters',
+}
+
+
+def _print_choice():
+    while True:
+        print("What filters do you wnt to know about (quit with 'q')?")
+        print(
+            "1. Sort options \n2. Property types \n3. Price, size and number of rooms \n4. Kitchen and heating types \n5. Amenities and ad filters")
+        sel = input(" > ")
+        if sel == 'q':
+            return
+        if sel in SELECTION_LABELS:
+            _print_options(FILTERS[SELECTION_LABELS[sel]])
+
+
+# Show help for search filter options
+def show_search_filters(**kwargs):
+    """
+    :param kwargs:
+        selection: one of the keys of FILTERS to print it, or 'print_all'. Otherwise the filters are
+            chosen interactively.
+    """
+    selection = kwargs.get('selection')
+
+    if selection == 'print_all':
+        for label in SELECTION_LABELS.values():
+            _print_options(FILTERS[label])
+    elif selection in FILTERS:
+        _print_options(FILTERS[selection])
+        _print_choice()
+    else:
+        _print_choice()
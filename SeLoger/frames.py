@@ -0,0 +1,83 @@
+import pandas as pd
+
+from .normalisation import DROPPED_COLUMNS, Normaliser
+
+
+class DataFrameBuilder(object):
+    """
+    Accumulate ads column by column and build a DataFrame once.
+
+    Parameters
+    ----------
+    drop : iterable
+        Columns left out of the DataFrame.
+    **kwargs :
+        Normaliser parameters (schema, categorical, max_category_ratio, price_per_m2).
+    """
+
+    def __init__(self, drop=DROPPED_COLUMNS, **kwargs):
+        self.drop = frozenset(drop or ())
+        self.normaliser = Normaliser(drop=self.drop, **kwargs)
+        self.columns = {}
+        self.num_rows = 0
+
+    def __len__(self):
+        return self.num_rows
+
+    def add(self, ad):
+        columns = self.columns
+        kept = 0
+        for key, value in ad.items():
+            if key in self.drop:
+                continue
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [None] * self.num_rows
+            column.append(value)
+            kept += 1
+        self.num_rows += 1
+
+        # Pad the columns missing from this ad (dropped keys are not counted)
+        if kept != len(columns):
+            for column in columns.values():
+                if len(column) < self.num_rows:
+                    column.append(None)
+
+    def extend(self, ads):
+        for ad in ads:
+            self.add(ad)
+        return self
+
+    def build(self):
+        """
+        :return: a DataFrame of the ads added so far, normalised by the Normaliser. The builder is emptied.
+        """
+        df = pd.DataFrame(self.columns)
+        self.columns = {}
+        self.num_rows = 0
+        return self.normaliser(df)
+
+
+def ads_to_dataframe(ads, **kwargs):
+    """
+    :param ads: an iterable of ad dictionaries.
+    :param kwargs: DataFrameBuilder parameters.
+    :return: a DataFrame with a row per ad.
+    """
+    return DataFrameBuilder(**kwargs).extend(ads).build()
+
+
+def iter_dataframes(ads, chunk_size=1000, **kwargs):
+    """
+    :param ads: an iterable of ad dictionaries.
+    :param chunk_size: number of ads per DataFrame.
+    :param kwargs: DataFrameBuilder parameters.
+    :return: a generator of DataFrames of chunk_size ads (the last one can be shorter).
+    """
+    builder = DataFrameBuilder(**kwargs)
+    for ad in ads:
+        builder.add(ad)
+        if len(builder) >= chunk_size:
+            yield builder.build()
+    if len(builder):
+        yield builder.build()
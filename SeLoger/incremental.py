@@ -0,0 +1,96 @@
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from time import time
+
+NEW = 'new'
+PRICE_CHANGED = 'price_changed'
+SEEN = 'seen'
+
+
+def search_key(url):
+    """
+    :return: a short key identifying a search from its url.
+    """
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
+
+class SeenIndex(object):
+    """
+    Persistent set of the ads already seen by each search, with their last price, stored in SQLite.
+
+    Parameters
+    ----------
+    path : str
+        Path of the index file.
+    """
+
+    def __init__(self, path='seloger-seen.sqlite'):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._db:
+            self._db.execute('''CREATE TABLE IF NOT EXISTS seen (
+                search TEXT,
+                idannonce TEXT,
+                prix TEXT,
+                first_seen REAL,
+                last_seen REAL,
+                PRIMARY KEY (search, idannonce)) WITHOUT ROWID''')
+
+    def prices(self, search, ids):
+        """
+        :return: a dictionary idannonce: last price of the ids already seen by the search.
+        """
+        ids = [str(i) for i in ids]
+        if not ids:
+            return {}
+        placeholders = ','.join('?' * len(ids))
+        with self._lock:
+            rows = self._db.execute(f'SELECT idannonce, prix FROM seen WHERE search = ? AND idannonce IN ({placeholders})',
+                                    [search] + ids).fetchall()
+        return dict(rows)
+
+    def classify(self, search, ads):
+        """
+        :return: a list of (ad, status) tuples, status being NEW, PRICE_CHANGED or SEEN.
+        """
+        known = self.prices(search, [ad.get('idannonce') for ad in ads])
+        classified = []
+        for ad in ads:
+            key = str(ad.get('idannonce'))
+            if key not in known:
+                classified.append((ad, NEW))
+            elif known[key] != _price(ad):
+                classified.append((ad, PRICE_CHANGED))
+            else:
+                classified.append((ad, SEEN))
+        return classified
+
+    def record(self, search, ads):
+        """
+        Add the ads to the index of the search, updating the price of the known ones.
+        """
+        now = time()
+        rows = [(search, str(ad.get('idannonce')), _price(ad), now, now) for ad in ads]
+        with self._lock, self._db:
+            self._db.executemany('''INSERT INTO seen VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (search, idannonce) DO UPDATE SET prix = excluded.prix, last_seen = excluded.last_seen''',
+                                 rows)
+
+    def forget(self, search):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM seen WHERE search = ?', (search,))
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+
+def _price(ad):
+    price = ad.get('prix')
+    return None if price is None else str(price)
@@ -0,0 +1,160 @@
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 5, 10, 15, 20, 25, 50)
+
+
+class Histogram(object):
+    """
+    Cumulative histogram, as in the Prometheus exposition format.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        total, counts = 0, []
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+
+class Metrics(object):
+    """
+    Registry of the counters and histograms of the crawler.
+
+    Every update is also passed to the hooks added with add_hook, as
+    hook(kind, name, value, labels) where kind is 'counter' or 'histogram'.
+
+    Main metrics:
+        requests_total{status}, request_errors_total, retries_total, fetch_seconds, bytes_downloaded_total,
+        cache_hits_total, cache_revalidations_total, rate_limiter_wait_seconds, parse_seconds, pages_total,
+        ads_per_page, ads_total, blocked_pages_total, details_total, detail_errors_total, detail_cache_hits_total,
+        detail_parse_seconds, throttle_decreases_total{reason}, throttle_pauses_total.
+
+    Parameters
+    ----------
+    prefix : str
+        Prefix of the metric names in the Prometheus export.
+    """
+
+    def __init__(self, prefix='seloger'):
+        self.prefix = prefix
+        self.counters = {}
+        self.histograms = {}
+        self.hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def _notify(self, kind, name, value, labels):
+        for hook in self.hooks:
+            hook(kind, name, value, labels)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        self._notify('counter', name, value, labels)
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+        self._notify('histogram', name, value, labels)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Observe the duration of the with block in the histogram name, in seconds.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - start, **labels)
+
+    def counter(self, name, **labels):
+        """
+        :return: the current value of a counter, 0 if it was never incremented.
+        """
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def snapshot(self):
+        """
+        :return: a dictionary of the counter values and of the histogram counts and sums, keyed by
+        'name' or 'name{label="value",...}'.
+        """
+        with self._lock:
+            snapshot = {_key(name, labels): value for (name, labels), value in self.counters.items()}
+            for (name, labels), histogram in self.histograms.items():
+                snapshot[_key(name, labels)] = {'count': histogram.count, 'sum': histogram.sum}
+        return snapshot
+
+    def to_prometheus(self):
+        """
+        :return: the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                full_name = f"{self.prefix}_{name}"
+                if full_name not in typed:
+                    lines.append(f"# TYPE {full_name} counter")
+                    typed.add(full_name)
+                lines.append(f"{_key(full_name, labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                full_name = f"{self.prefix}_{name}"
+                if full_name not in typed:
+                    lines.append(f"# TYPE {full_name} histogram")
+                    typed.add(full_name)
+                bounds = [repr(float(bound)) for bound in histogram.buckets] + ['+Inf']
+                for bound, count in zip(bounds, histogram.cumulative_counts()):
+                    lines.append(f"{_key(full_name + '_bucket', labels + (('le', bound),))} {count}")
+                lines.append(f"{_key(full_name + '_sum', labels)} {histogram.sum}")
+                lines.append(f"{_key(full_name + '_count', labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+def _key(name, labels):
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{label}="{value}"' for label, value in labels) + '}'
+
+
+metrics = Metrics()
+
+
+def log_hook(logger, level=10):
+    """
+    :return: a hook logging every metric update with logger, at DEBUG level by default.
+    """
+    def hook(kind, name, value, labels):
+        logger.log(level, '%s %s %s %s', kind, name, value, labels)
+    return hook
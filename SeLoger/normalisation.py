@@ -0,0 +1,202 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Kinds of columns
+ID = 'id'
+PRICE = 'price'
+AREA = 'area'
+COUNT = 'count'
+NUMBER = 'number'
+FLAG = 'flag'
+DATE = 'date'
+CATEGORY = 'category'
+TEXT = 'text'
+DROP = 'drop'
+
+SCHEMA = {
+    'idannonce': ID,
+    'idagence': ID,
+    'prix': PRICE,
+    'surface': AREA,
+    'nb_pieces': COUNT,
+    'nb_chambres': COUNT,
+    'nb_photos': COUNT,
+    'etage': COUNT,
+    'cp': CATEGORY,
+    'ville': CATEGORY,
+    'typedebien': CATEGORY,
+    'dtcreation': DATE,
+    'affichagetype': DROP,
+    'idtypepublicationsourcecouplage': DROP,
+    'produitsvisibilite': DROP,
+}
+
+# Kinds of the columns missing from the schema, by name prefix
+PREFIXES = (('nb', COUNT), ('si_', FLAG))
+
+DROPPED_COLUMNS = tuple(column for column, kind in SCHEMA.items() if kind == DROP)
+
+# Units, currency and separators: everything but the digits, the sign and the marks
+NUMBER_NOISE = r'm[²2]|[^\d,.\-]'
+
+
+def _decimal_strings(strings):
+    # '.' and ',' are thousands separators when they appear more than once ('1.234.000') or before
+    # the other mark ('1.234,5', '1,234.5'); the remaining mark is the decimal one.
+    strings = strings.str.replace(r'\.(?=.*,)', '', regex=True).str.replace(r',(?=.*\.)', '', regex=True)
+    for mark in ('.', ','):
+        repeated = strings.str.count(re.escape(mark)) > 1
+        strings[repeated] = strings[repeated].str.replace(mark, '', regex=False)
+    return strings.str.replace(',', '.', regex=False)
+
+
+def to_numeric(series):
+    """
+    Convert a column of scraped strings ('450 000 €', '35,5 m²', '1.234.000 €') to floats. Values
+    that cannot be converted become NaN. Each distinct value is parsed once.
+
+    >>> to_numeric(pd.Series(['450 000 €', '35,5 m²', '1.234.000 €', '1.234,5', None, 'NC'])).tolist()
+    [450000.0, 35.5, 1234000.0, 1234.5, nan, nan]
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype('float64')
+    try:
+        codes, uniques = pd.factorize(series)
+    except TypeError:
+        # Lists or dictionaries
+        codes, uniques = pd.factorize(series.map(str, na_action='ignore'))
+    strings = pd.Series(uniques, dtype=object).map(str)
+    strings = _decimal_strings(strings.str.replace(NUMBER_NOISE, '', regex=True))
+    # The code of missing values is -1: it takes the trailing NaN
+    values = np.append(pd.to_numeric(strings, errors='coerce').to_numpy(dtype='float64'), np.nan)
+    return pd.Series(values[codes], index=series.index, name=series.name)
+
+
+def to_count(series):
+    """
+    :return: the column as nullable integers, or floats if some values are not whole numbers.
+
+    >>> to_count(pd.Series(['3', '12', None])).tolist()
+    [3, 12, <NA>]
+    """
+    values = to_numeric(series)
+    whole = values.dropna()
+    if (whole == np.floor(whole)).all():
+        return values.astype('Int64')
+    return values
+
+
+def to_flag(series):
+    """
+    :return: the column as nullable booleans: '0' and 'false' are False, other numbers and 'true' True.
+
+    >>> to_flag(pd.Series(['1', '0', 'true', 'Non', None])).tolist()
+    [True, False, True, False, <NA>]
+    """
+    if series.dtype == bool:
+        return series
+    strings = series.map(str, na_action='ignore').str.strip().str.lower()
+    values = to_numeric(strings.replace({'true': '1', 'false': '0', 'oui': '1', 'non': '0'}))
+    flags = pd.array(values != 0, dtype='boolean')
+    flags[values.isna().to_numpy()] = pd.NA
+    return pd.Series(flags, index=series.index, name=series.name)
+
+
+class Normaliser(object):
+    """
+    Clean a DataFrame of ads column by column according to a schema of column kinds: ids as strings,
+    prices, surfaces and counts as numbers (without spaces, NBSP, thousands separators and units),
+    flags as booleans, dates as datetimes and repeated strings as categories, text left as is. A prix_m2
+    column is added.
+
+    Every conversion works on whole columns, so a DataFrame of stored ads is cleaned as fast as a fresh crawl.
+
+    Parameters
+    ----------
+    schema : dict
+        Kind of each column, among the constants of this module. Defaults to SCHEMA.
+    drop : iterable
+        Other columns left out.
+    categorical : iterable
+        Columns converted to the category dtype, besides those of kind CATEGORY. If None, every other
+        string column whose number of distinct values is at most max_category_ratio times its length
+        is converted.
+    max_category_ratio : float
+        See categorical.
+    price_per_m2 : bool
+        Add a prix_m2 column, prix divided by surface.
+    """
+
+    def __init__(self, schema=None, drop=(), categorical=None, max_category_ratio=0.5, price_per_m2=True):
+        self.schema = dict(SCHEMA if schema is None else schema)
+        for column in drop or ():
+            self.schema[column] = DROP
+        self.categorical = categorical
+        self.max_category_ratio = max_category_ratio
+        self.price_per_m2 = price_per_m2
+
+    def kind(self, column):
+        """
+        :return: the kind of a column, None for the columns neither in the schema nor matching a prefix.
+        """
+        kind = self.schema.get(column)
+        if kind is None:
+            for prefix, prefix_kind in PREFIXES:
+                if column.startswith(prefix):
+                    return prefix_kind
+        return kind
+
+    def _to_category(self, series):
+        if self.categorical is not None:
+            return series.name in self.categorical
+        if not pd.api.types.is_object_dtype(series) and not pd.api.types.is_string_dtype(series):
+            return False
+        if len(series) == 0:
+            return False
+        try:
+            distinct = series.nunique()
+        except TypeError:
+            # Lists or dictionaries
+            return False
+        return distinct <= self.max_category_ratio * len(series) and series.dropna().map(type).eq(str).all()
+
+    def __call__(self, df):
+        """
+        :return: the normalised DataFrame. df is left untouched.
+        """
+        columns = {}
+        for column in df.columns:
+            kind = self.kind(column)
+            series = df[column]
+            if kind == DROP:
+                continue
+            if kind == ID:
+                series = series.map(str, na_action='ignore')
+            elif kind in (PRICE, AREA, NUMBER):
+                series = to_numeric(series)
+            elif kind == COUNT:
+                series = to_count(series)
+            elif kind == FLAG:
+                series = to_flag(series)
+            elif kind == DATE:
+                series = pd.to_datetime(series, errors='coerce')
+            elif kind == CATEGORY or (kind is None and self._to_category(series)):
+                series = series.astype('category')
+            columns[column] = series
+        df = pd.DataFrame(columns, index=df.index)
+
+        if self.price_per_m2 and 'prix' in df and 'surface' in df:
+            surface = df['surface'].where(df['surface'] > 0)
+            df['prix_m2'] = df['prix'] / surface
+        return df
+
+
+def normalise(df, **kwargs):
+    """
+    :param df: a DataFrame of ads, ex. read from a previous export.
+    :param kwargs: Normaliser parameters.
+    :return: the normalised DataFrame.
+    """
+    return Normaliser(**kwargs)(df)
@@ -0,0 +1,209 @@
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# The search payload is the first JavaScript object of the main block of the page,
+# assigned just before the 'ava...' statements.
+_MAIN_BLOCK = re.compile(rb'class="[^"]*\bc-wrap-main\b')
+_PAYLOAD_END = re.compile(rb'\}\s*;\s*ava')
+_FIRST_META = re.compile(rb'<meta\b[^>]*>', re.IGNORECASE)
+_ROBOTS_NAME = re.compile(rb'\bname\s*=\s*["\']?robots\b', re.IGNORECASE)
+
+MAX_CANDIDATES = 20
+
+_decoder = json.JSONDecoder()
+
+
+def _as_bytes(content):
+    if isinstance(content, bytes):
+        return content
+    if isinstance(content, str):
+        return content.encode('utf-8')
+    # A BeautifulSoup document or tag
+    return str(content).encode('utf-8')
+
+
+def _loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def is_blocked(content):
+    """
+    :param content: the raw html of a page (bytes or str).
+    :return: True if the first meta tag of the page is a robots one, which is what seloger.com
+    serves instead of the results when the crawler has been detected.
+    """
+    meta = _FIRST_META.search(_as_bytes(content))
+    return bool(meta and _ROBOTS_NAME.search(meta.group(0)))
+
+
+def extract_payload(content):
+    """
+    Extract the search payload embedded in the JavaScript of a result page, without
+    building the html tree.
+    :param content: the raw html of the page (bytes or str), or a BeautifulSoup parsed page.
+    :return: the payload decoded with a JSON decoder (orjson if installed), as a dictionary.
+    :raise ValueError: if no JSON object can be found in the main block of the page.
+    """
+    content = _as_bytes(content)
+    main_block = _MAIN_BLOCK.search(content)
+    position = main_block.end() if main_block else 0
+
+    for _ in range(MAX_CANDIDATES):
+        start = content.find(b'{', position)
+        if start < 0:
+            break
+
+        end = _PAYLOAD_END.search(content, start)
+        if end:
+            try:
+                payload = _loads(content[start:end.start() + 1])
+            except ValueError:
+                pass
+            else:
+                if isinstance(payload, dict):
+                    return payload
+
+        # No usual terminator: let the decoder find the end of the object
+        try:
+            payload, _ = _decoder.raw_decode(content[start:].decode('utf-8', 'replace'))
+        except ValueError:
+            pass
+        else:
+            if isinstance(payload, dict):
+                return payload
+
+        position = start + 1
+
+    raise ValueError('No JSON payload found in the page')
+
+
+def _find_key(payload, key):
+    # Depth-first search of key in the nested dictionaries and lists of the payload
+    stack = [payload]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            if key in item:
+                return item[key]
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return None
+
+
+def to_float(value):
+    """
+    :param value: a number as written on seloger.com, ex. '450 000', '35,5' or '1\xa0234'.
+    :return: the number as a float, or None if it cannot be read.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(re.sub(r'\s', '', str(value)).replace(',', '.'))
+    except ValueError:
+        return None
+
+
+def _to_int(value):
+    digits = re.sub(r'\D', '', str(value))
+    return int(digits) if digits else None
+
+
+class Page(object):
+    """
+    A result page, parsed once.
+
+    Parameters
+    ----------
+    content : bytes
+        Raw html of the page.
+    payload : dict
+        The search payload decoded from the page.
+    url : str
+        Url of the page.
+    soup : BeautifulSoup
+        The parsed html tree, when a DOM parser backend was used. Built on first access otherwise.
+    """
+
+    def __init__(self, content, payload, url=None, soup=None):
+        self.content = content
+        self.payload = payload
+        self.url = url
+        self._soup = soup
+        self.num_results = self._metadata('nbresults')
+        self.page_num = self._metadata('nbpage')
+
+    def _metadata(self, key):
+        value = _find_key(self.payload, key)
+        if value is None:
+            match = re.search(rb'"' + key.encode() + rb'"\s*:\s*"?([^",}]*)', self.content)
+            value = match.group(1).decode('utf-8', 'replace') if match else None
+        return _to_int(value) if value is not None else None
+
+    @property
+    def products(self):
+        return self.payload.get('products') or []
+
+    @property
+    def soup(self):
+        if self._soup is None:
+            from bs4 import BeautifulSoup
+            self._soup = BeautifulSoup(self.content, 'html.parser')
+        return self._soup
+
+    def __repr__(self):
+        return f"<Page {self.page_num} of {self.url}: {len(self.products)} ads>"
+
+
+def _parse_json(content, url=None):
+    return Page(content, extract_payload(content), url=url)
+
+
+def _dom_parser(features):
+    def parse(content, url=None):
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(content, features)
+        main_block = soup.find('div', {'class': 'c-wrap-main'})
+        payload = extract_payload(main_block.encode() if main_block is not None else content)
+        return Page(content, payload, url=url, soup=soup)
+    return parse
+
+
+PARSERS = {
+    'json': _parse_json,
+    'html.parser': _dom_parser('html.parser'),
+    'lxml': _dom_parser('lxml'),
+}
+
+
+def register_parser(name, parse):
+    """
+    Register a parser backend.
+    :param name: the name used with the parser option of the SeLoger classes.
+    :param parse: a function taking the raw html of a page (and the url keyword) and returning a Page.
+    """
+    PARSERS[name] = parse
+
+
+def parse_page(content, parser='json', url=None):
+    """
+    Parse a result page in a single pass.
+    :param content: raw html of the page.
+    :param parser: the parser backend: 'json' (default, no html tree), 'html.parser', 'lxml' or a registered one.
+    :param url: url of the page.
+    :return: a Page.
+    """
+    try:
+        parse = PARSERS[parser]
+    except KeyError:
+        raise ValueError(f"Unknown parser {parser!r}, choose one of {sorted(PARSERS)}")
+    return parse(_as_bytes(content), url=url)
@@ -0,0 +1,158 @@
+import logging
+from math import sqrt
+
+from .batch import BatchCrawler
+
+log = logging.getLogger(__name__)
+
+RESULTS_PER_PAGE = 20
+MAX_PAGES = 100
+MAX_RESULTS = RESULTS_PER_PAGE * MAX_PAGES
+
+
+class Partition(object):
+    """
+    A sub-search of a planned search, small enough to be crawled completely.
+    """
+
+    def __init__(self, search, num_results, first_page):
+        self.search = search
+        self.num_results = num_results
+        self.first_page = first_page
+
+    @property
+    def search_params(self):
+        return self.search.search_params
+
+    def get_results(self, max_num_pages=None):
+        # The first page fetched while planning is not downloaded again
+        return self.search.get_results(max_num_pages=max_num_pages, first_page=self.first_page)
+
+    def __repr__(self):
+        return f"<Partition {self.search_params}: {self.num_results} results>"
+
+
+class SearchPlanner(object):
+    """
+    Split a search returning more ads than the site shows (100 pages of 20 ads) into sub-searches
+    that each fit under the cap, then crawl them in parallel.
+
+    Searches are split by postcode when 'cp' holds several comma-separated postcodes, then by
+    price band (pxmin/pxmax), then by surface band (surfacemin/surfacemax). Wide price and surface
+    ranges are split geometrically, narrow ones in the middle. Adjacent bands share their bound so that
+    no ad falls between them; the ads on a bound are only yielded once when dedupe is on.
+
+    Parameters
+    ----------
+    search_class : class
+        A SelogerBase subclass, ex. SeLogerAchat.
+    search_params : dict
+        The search to split.
+    max_results : int
+        Maximum number of results of a partition.
+    max_price : int
+        Upper price bound used when the search has no pxmax.
+    max_surface : int
+        Upper surface bound used when the search has no surfacemax.
+    min_price_band : int
+        Price bands narrower than this are not split further.
+    **kwargs :
+        Options given to the sub-searches (delay, transport, cache, ...).
+    """
+
+    def __init__(self, search_class, search_params, max_results=MAX_RESULTS, max_price=100000000, max_surface=10000,
+                 min_price_band=1000, **kwargs):
+        self.search_class = search_class
+        self.search_params = dict(search_params)
+        self.max_results = max_results
+        self.max_price = max_price
+        self.max_surface = max_surface
+        self.min_price_band = min_price_band
+        self.options = kwargs
+        if 'transport' not in self.options:
+            from .transport import Transport
+            self.options['transport'] = Transport(**self.options.pop('transport_options', {}))
+        self.partitions = None
+
+    def probe(self, search_params):
+        """
+        Fetch the first page of a search.
+        :return: a Partition, with num_results None if the page could not be fetched.
+        """
+        search = self.search_class(search_params, **self.options)
+        content = search._get_first_page()
+        if content is None:
+            return Partition(search, None, None)
+        page = search._parse(content, search.url)
+        return Partition(search, page.num_results or 0, page)
+
+    def split(self, search_params):
+        """
+        :return: a list of sub-searches covering search_params, empty if it cannot be split.
+        """
+        postcodes = [cp for cp in str(search_params.get('cp', '')).split(',') if cp]
+        if len(postcodes) > 1:
+            middle = len(postcodes) // 2
+            return [dict(search_params, cp=','.join(half)) for half in (postcodes[:middle], postcodes[middle:])]
+
+        bands = _split_range(search_params, 'pxmin', 'pxmax', self.max_price, self.min_price_band)
+        if bands:
+            return bands
+        return _split_range(search_params, 'surfacemin', 'surfacemax', self.max_surface, 1)
+
+    def plan(self):
+        """
+        Probe the search and split it recursively until every partition fits under max_results.
+        :return: the list of Partitions, also kept in the partitions attribute.
+        """
+        partitions = []
+        pending = [self.search_params]
+        while pending:
+            search_params = pending.pop()
+            partition = self.probe(search_params)
+            if partition.num_results is None:
+                log.error('Could not plan %s: the first page could not be fetched.', search_params)
+                continue
+            if partition.num_results == 0:
+                continue
+            if partition.num_results <= self.max_results:
+                partitions.append(partition)
+                continue
+            sub_searches = self.split(search_params)
+            if sub_searches:
+                log.info('%s returned %s results, splitting it in %s.', search_params, partition.num_results,
+                         len(sub_searches))
+                pending.extend(sub_searches)
+            else:
+                log.warning('%s returned %s results and cannot be split further: it will be truncated.',
+                            search_params, partition.num_results)
+                partitions.append(partition)
+
+        log.info('%s partitions, %s results in total.', len(partitions), sum(p.num_results for p in partitions))
+        self.partitions = partitions
+        return partitions
+
+    def get_results(self, workers=4, dedupe=True):
+        """
+        Plan the search if needed and crawl its partitions in parallel.
+        :return: a generator of ad dictionaries, deduplicated by idannonce.
+        """
+        if self.partitions is None:
+            self.plan()
+        return BatchCrawler(self.partitions, workers=workers, dedupe=dedupe,
+                            transport=self.options['transport']).get_results()
+
+
+def _split_range(search_params, low_key, high_key, default_high, min_band):
+    low = int(float(search_params.get(low_key) or 0))
+    high = int(float(search_params.get(high_key) or default_high))
+    if high - low <= min_band:
+        return []
+    if high > 4 * max(low, 1):
+        middle = int(sqrt(max(low, 1) * high))
+    else:
+        middle = (low + high) // 2
+    # The bands share their bound: prices and surfaces are not whole numbers (45,5 m²), and the ads
+    # on the bound, returned by both bands, are deduplicated by idannonce
+    return [dict(search_params, **{low_key: str(low), high_key: str(middle)}),
+            dict(search_params, **{low_key: str(middle), high_key: str(high)})]
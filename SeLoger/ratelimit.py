@@ -0,0 +1,89 @@
+import threading
+from time import monotonic, sleep
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket rate limiter.
+
+    Parameters
+    ----------
+    rate : float
+        Number of tokens added per second, i.e. the sustained number of requests per second.
+    capacity : float
+        Maximum number of tokens stored, i.e. the largest burst allowed.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._last = monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def throttle_to(self, rate):
+        """
+        Lower the rate of the bucket to rate if it is currently higher.
+        """
+        with self._lock:
+            self._refill()
+            self.rate = min(self.rate, float(rate))
+
+    def set_rate(self, rate):
+        """
+        Change the rate of the bucket, up or down.
+        """
+        with self._lock:
+            self._refill()
+            self.rate = float(rate)
+
+    def acquire(self, tokens=1):
+        """
+        Block until tokens are available and take them.
+        :return: the number of seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            sleep(wait)
+            waited += wait
+
+    def reserve(self, tokens=1):
+        """
+        Take tokens without blocking, possibly before they are available: callers that do not want to
+        block a thread, ex. coroutines, sleep the returned time themselves. Reservations are served in order.
+        :return: the number of seconds to wait before using the tokens.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def shared_rate_limiter(delay):
+    """
+    :param delay: number of seconds between requests wanted by the caller.
+    :return: the process-wide TokenBucket shared by all the SeLoger instances. Its rate is
+    the most conservative one asked for so far, one request every delay seconds.
+    """
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = TokenBucket(1 / delay)
+            return _shared_limiter
+    _shared_limiter.throttle_to(1 / delay)
+    return _shared_limiter
@@ -0,0 +1,207 @@
+import sys
+from array import array
+from math import isnan
+
+from .parsing import to_float
+
+NUMERIC_FIELDS = ('prix', 'surface')
+COUNT_FIELDS = ('nb_pieces', 'nb_chambres', 'nb_photos')
+CATEGORICAL_FIELDS = ('cp', 'ville', 'typedebien')
+FIELDS = ('idannonce',) + NUMERIC_FIELDS + COUNT_FIELDS + CATEGORICAL_FIELDS
+
+_MISSING_COUNT = -1
+
+
+def _id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _count(value):
+    number = to_float(value)
+    return None if number is None or isnan(number) else int(number)
+
+
+def _category(value):
+    return None if value is None else sys.intern(str(value))
+
+
+class Ad(object):
+    """
+    Typed record of an ad: numeric idannonce, float prix and surface, integer room and photo
+    counts, interned cp, ville and typedebien. The other fields of the payload are kept in
+    the extra dictionary (None if they were not kept).
+    """
+
+    __slots__ = FIELDS + ('extra',)
+
+    def __init__(self, idannonce, prix=None, surface=None, nb_pieces=None, nb_chambres=None, nb_photos=None,
+                 cp=None, ville=None, typedebien=None, extra=None):
+        self.idannonce = idannonce
+        self.prix = prix
+        self.surface = surface
+        self.nb_pieces = nb_pieces
+        self.nb_chambres = nb_chambres
+        self.nb_photos = nb_photos
+        self.cp = cp
+        self.ville = ville
+        self.typedebien = typedebien
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, ad, keep_extra=True):
+        """
+        :param ad: an ad dictionary as yielded by get_results().
+        :param keep_extra: keep the fields that have no attribute in the extra dictionary.
+        """
+        extra = {key: value for key, value in ad.items() if key not in FIELDS} if keep_extra else None
+        return cls(_id(ad.get('idannonce')),
+                   to_float(ad.get('prix')), to_float(ad.get('surface')),
+                   _count(ad.get('nb_pieces')), _count(ad.get('nb_chambres')), _count(ad.get('nb_photos')),
+                   _category(ad.get('cp')), _category(ad.get('ville')), _category(ad.get('typedebien')),
+                   extra)
+
+    @property
+    def prix_m2(self):
+        if self.prix is None or not self.surface:
+            return None
+        return self.prix / self.surface
+
+    def to_dict(self):
+        ad = dict(self.extra or {})
+        for field in FIELDS:
+            ad[field] = getattr(self, field)
+        return ad
+
+    def __eq__(self, other):
+        if not isinstance(other, Ad):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __hash__(self):
+        # Equal records have the same id: records can be deduplicated in a set
+        return hash(self.idannonce)
+
+    def __repr__(self):
+        return f"<Ad {self.idannonce}: {self.typedebien} {self.surface} m2 {self.prix} EUR {self.cp} {self.ville}>"
+
+
+class AdBatch(object):
+    """
+    Many ads stored column-wise: ids, prices and surfaces in typed arrays, counts in an integer
+    array, cp, ville and typedebien as category codes. Takes a fraction of the memory of the
+    same ads as dictionaries.
+
+    Parameters
+    ----------
+    ads : iterable
+        Ads to add, as dictionaries or Ad records.
+    keep_extra : bool
+        Keep the fields without a column, as one dictionary per ad.
+    """
+
+    def __init__(self, ads=(), keep_extra=False):
+        self.keep_extra = keep_extra
+        self.ids = array('q')
+        # Index of the ids, for the membership tests of the deduplication
+        self._id_set = set()
+        self.numbers = {field: array('d') for field in NUMERIC_FIELDS}
+        self.counts = {field: array('i') for field in COUNT_FIELDS}
+        self.codes = {field: array('I') for field in CATEGORICAL_FIELDS}
+        self.categories = {field: [] for field in CATEGORICAL_FIELDS}
+        self._category_index = {field: {} for field in CATEGORICAL_FIELDS}
+        self.extras = [] if keep_extra else None
+        self.extend(ads)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _append_id(self, value):
+        self._id_set.add(value)
+        if isinstance(self.ids, array):
+            try:
+                self.ids.append(value)
+                return
+            except (TypeError, OverflowError):
+                # Not numeric: fall back to a list
+                self.ids = list(self.ids)
+        self.ids.append(value)
+
+    def _code(self, field, value):
+        index = self._category_index[field]
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(self.categories[field])
+            self.categories[field].append(value)
+        return code
+
+    def append(self, ad):
+        if not isinstance(ad, Ad):
+            ad = Ad.from_dict(ad, keep_extra=self.keep_extra)
+        self._append_id(ad.idannonce)
+        for field, column in self.numbers.items():
+            value = getattr(ad, field)
+            column.append(float('nan') if value is None else value)
+        for field, column in self.counts.items():
+            value = getattr(ad, field)
+            column.append(_MISSING_COUNT if value is None else value)
+        for field, column in self.codes.items():
+            column.append(self._code(field, getattr(ad, field)))
+        if self.extras is not None:
+            self.extras.append(ad.extra)
+
+    def extend(self, ads):
+        for ad in ads:
+            self.append(ad)
+        return self
+
+    def __getitem__(self, i):
+        values = {'idannonce': self.ids[i]}
+        for field, column in self.numbers.items():
+            value = column[i]
+            values[field] = None if isnan(value) else value
+        for field, column in self.counts.items():
+            value = column[i]
+            values[field] = None if value == _MISSING_COUNT else value
+        for field, column in self.codes.items():
+            values[field] = self.categories[field][column[i]]
+        values['extra'] = self.extras[i] if self.extras is not None else None
+        return Ad(**values)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __contains__(self, idannonce):
+        return _id(idannonce) in self._id_set
+
+    def id_set(self):
+        """
+        :return: a copy of the set of the ids of the batch, ex. to deduplicate.
+        """
+        return set(self._id_set)
+
+    def to_dataframe(self):
+        """
+        :return: a DataFrame with a column per field, cp, ville and typedebien as categoricals.
+        """
+        import pandas as pd
+        import numpy as np
+        data = {'idannonce': np.asarray(self.ids)}
+        for field, column in self.numbers.items():
+            data[field] = np.array(column, dtype='float64')
+        for field, column in self.counts.items():
+            values = pd.array(np.asarray(column, dtype='int64'), dtype='Int64')
+            values[values == _MISSING_COUNT] = pd.NA
+            data[field] = values
+        for field, column in self.codes.items():
+            categories = self.categories[field]
+            # Missing values get the -1 code of pandas
+            remap = np.full(len(categories), -1, dtype='int64')
+            kept = [code for code, value in enumerate(categories) if value is not None]
+            remap[kept] = np.arange(len(kept))
+            codes = remap[np.asarray(column, dtype='int64')] if len(column) else np.array([], dtype='int64')
+            data[field] = pd.Categorical.from_codes(codes, categories=[categories[code] for code in kept])
+        return pd.DataFrame(data)
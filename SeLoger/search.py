@@ -0,0 +1,491 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+from pathlib import Path
+import logging
+import os
+
+from .cache import ResponseCache
+from .checkpoint import Checkpoint
+from .enrich import Enricher
+from .filters import search_query
+from .incremental import NEW, SEEN, SeenIndex, search_key
+from .metrics import COUNT_BUCKETS
+from .metrics import metrics as default_metrics
+from .parsing import Page, extract_payload, is_blocked, parse_page
+from .ratelimit import shared_rate_limiter
+from .records import Ad
+from .sinks import sink_for
+from .throttle import resolve_throttle
+from .transport import Transport, default_transport
+
+log = logging.getLogger(__name__)
+
+
+def requests_get(*args, **kwargs):
+    """
+    Retries with exponential backoff if a RequestException is raised (could be
+    a connection error or a timeout) or a retryable status code is returned.
+    Goes through the shared process-wide Transport unless one is given with
+    the 'transport' keyword.
+    """
+
+    transport = kwargs.pop('transport', None) or default_transport()
+    return transport.get(*args, **kwargs)
+
+
+def print_results(results: dict):
+    print(f"** Annonce {results['idannonce']} **")
+    for key, value in results.items():
+        print(f"'{key}': '{value}'")
+    print("\n\n")
+
+
+class SelogerBase(object):
+    """
+    Base class for all Seloger wrapper
+
+    Parameters
+    ----------
+    class_filters : dict
+        Main search options
+        ex. {'transaction_type':['achat'], 'bien': ['appartement', 'maison'], 'naturebien': ['ancien', 'neuf']}
+    type_of_search: str
+        Can be either 'base', for ads of properties on the market, or 'biens-vendus' for the search on the property sold section.
+    location : dict
+        Either one of the following:
+        postcode (ex. {'code_postal': 75015} or {'code_postal': 75})
+        INSEE code (ex. {'code_INSEE': 75115})
+        Location name (ex. {'location_name': 'PARIS'})
+    *argv : str
+        Search options from binary_filter_options
+    **kwargs: dict ex.{'delay': 2}
+        Other search options or tweaking parameters
+        base_url: the search page to query instead of the class one, ex. 'http://127.0.0.1:8000/list.htm?'.
+        delay: number of seconds between requests, used to avoid overcharging servers. The budget is shared
+            by all the instances of the process: the rate limiter runs at the most conservative delay asked for.
+        rate_limiter: a TokenBucket to use instead of the process-wide one.
+        parser: how result pages are parsed: 'json' (default) decodes the payload from the raw html
+            without building a tree, 'html.parser' and 'lxml' also build a BeautifulSoup tree.
+        transport: a Transport shared by every request of the instance. Pass the same
+            Transport to several instances to share their connection pool.
+        transport_options: dict of Transport parameters (pool_maxsize, max_per_host, timeout,
+            max_retries, backoff_factor, cache, ...) used when no transport is given.
+        cache: a ResponseCache (or the path of one) storing the result pages, so that re-running
+            or resuming a search does not download them again. Ignored if a transport is given.
+        metrics: a Metrics registry receiving the counters and timings of the crawl, the
+            process-wide SeLoger.default_metrics by default.
+        throttle: an AdaptiveThrottle (or True for the process-wide one, starting at one request every delay
+            seconds) tuning the rate of each host from the responses, instead of the fixed delay. Robots pages
+            then pause the crawl and are retried instead of ending it. If the transport already has a
+            throttle, it is used instead.
+        max_block_retries: number of times a robots page is retried with a throttle, default 3.
+    Returns
+    -------
+
+
+    """
+
+    base_url = "http://www.seloger.com/list.htm?"
+    idtt = None
+
+    def __init__(self, search_params=None, **kwargs):
+        # Get parameters
+        self.search_params = dict(search_params or {})
+        self.base_url = kwargs.get('base_url') or self.base_url
+        self.url = self.base_url + "idtt=" + str(self.idtt) + search_query(self.search_params)
+        self.delay = kwargs.get('delay') or 3
+        self.rate_limiter = kwargs.get('rate_limiter') or shared_rate_limiter(self.delay)
+        self.parser = kwargs.get('parser') or 'json'
+        self.metrics = kwargs.get('metrics') or default_metrics
+        transport_options = dict(kwargs.get('transport_options', {}))
+        transport_options.setdefault('metrics', self.metrics)
+        cache = kwargs.get('cache')
+        if cache is not None:
+            transport_options['cache'] = cache if isinstance(cache, ResponseCache) else ResponseCache(cache)
+        transport = kwargs.get('transport')
+        throttle = resolve_throttle(kwargs.get('throttle'), transport, self.delay, self.metrics)
+        if throttle:
+            transport_options['throttle'] = throttle
+        self.transport = transport or Transport(**transport_options)
+        if throttle and self.transport.throttle is None:
+            # The throttle learns from the responses of the transport
+            self.transport.throttle = throttle
+        self.throttle = self.transport.throttle
+        self.max_block_retries = kwargs.get('max_block_retries', 3)
+
+    def get_current_parameters(self, search_url=True, *args, **kwargs):
+        """
+        Retrieve search parameters from the html page of a search on Seloger.com
+        :param search_url: The page url is passed as an input (True) or a page (False).
+        :param args: A Page, the raw html of a page (bytes or str) or a BeautifulSoup parsed page.
+        :param kwargs:
+            write_to: a string with the path and name of a file to save the text of the url or the parsed page.
+            overwrite: replace the write_to file if it exists, otherwise FileExistsError is raised.
+        :return: a dictionary with the search parameters as they appear in the json of html page.
+        """
+
+        if search_url:
+            page_content = self._get_first_page()
+            if page_content is None:
+                return
+        else:
+            page_content = args[0]
+
+        write_to = kwargs.get('write_to')
+
+        # Save html to file, through a temporary file so that a partial file is never left behind
+
+        if write_to:
+            my_file = Path(write_to)
+            if my_file.is_file() and not kwargs.get('overwrite'):
+                raise FileExistsError(f"{write_to} exists already, use overwrite=True to replace it.")
+            if isinstance(page_content, Page):
+                page_text = page_content.soup.text
+            elif isinstance(page_content, (bytes, str)):
+                from bs4 import BeautifulSoup
+                page_text = BeautifulSoup(page_content, 'html.parser').text
+            else:
+                page_text = page_content.text
+            part_file = my_file.with_name(my_file.name + '.part')
+            with open(part_file, 'w+') as file:
+                file.write(page_text)
+            os.replace(part_file, my_file)
+
+        # Extact the json from the JavaScript of the page
+        if isinstance(page_content, Page):
+            return page_content.payload
+        params = extract_payload(page_content)
+        return params
+
+    def page_url(self, page_num):
+        """
+        :return: the url of the result page number page_num.
+        """
+        if page_num == 1:
+            return self.url
+        return self.url + "&LISTING-LISTpg=" + str(page_num)
+
+    def _wait(self, url):
+        if self.throttle is not None:
+            waited = self.throttle.acquire(url)
+        else:
+            waited = self.rate_limiter.acquire()
+        self.metrics.observe('rate_limiter_wait_seconds', waited)
+
+    def _parse(self, content, url):
+        with self.metrics.timer('parse_seconds'):
+            page = parse_page(content, self.parser, url=url)
+        self.metrics.inc('pages_total')
+        self.metrics.observe('ads_per_page', len(page.products), buckets=COUNT_BUCKETS)
+        return page
+
+    def _fetch(self, url, revalidate=False):
+        """
+        Get a result page, waiting for the rate limiter unless it is served fresh from the cache. With a
+        throttle, a robots page pauses the requests to the site and is retried up to max_block_retries times.
+        :return: the raw html of the page, or None if it is a robots page.
+        """
+        retries = 0
+        while True:
+            content = self.transport.get(url, wait=lambda: self._wait(url), revalidate=revalidate).content
+            if not is_blocked(content):
+                if self.throttle is not None:
+                    self.throttle.valid_page(url)
+                return content
+            self.metrics.inc('blocked_pages_total')
+            self.transport.forget(url)
+            if self.throttle is None or retries >= self.max_block_retries:
+                return None
+            retries += 1
+            pause = self.throttle.blocked(url)
+            log.warning('Robots page instead of %s: retrying in %.1f s (%s/%s).', url, pause, retries,
+                        self.max_block_retries)
+
+    def _get_first_page(self, revalidate=False):
+        """
+        Get the first result page of the search.
+        :return: the raw html of the page, or None if the request failed or the page is a robots one.
+        """
+        log.info("Get pages from base url %s", self.url)
+        try:
+            page0 = self._fetch(self.url, revalidate)
+        except Exception as exc:
+            log.error('Request to %s failed (%s) - They might have detected the crawler, try changing ip.',
+                      self.url, exc)
+            return
+
+        # Check validity of the page
+        if page0 is None:
+            log.error('Invalid result page - They might have detected the crawler, try changing ip.')
+            return
+        log.debug("Valid response from %s", self.url)
+        return page0
+
+    def fetch_page(self, page_num, revalidate=False):
+        """
+        Get and parse a result page, waiting for the rate limiter unless it is cached.
+        :return: a Page.
+        :raise ValueError: if a robots page is received instead.
+        """
+        current_page_url = self.page_url(page_num)
+        log.debug("Get url %s", current_page_url)
+        current_page = self._fetch(current_page_url, revalidate)
+        if current_page is None:
+            raise ValueError(f"Robots page instead of {current_page_url} - They might have detected the crawler.")
+        current_page_parsed = self._parse(current_page, current_page_url)
+        log.debug("Page %s parsed", page_num)
+        return current_page_parsed
+
+    def get_pages(self, **kwargs):
+        """
+        :param kwargs:
+            max_num_pages: maximum number of pages to be processed. If left empty, it is set to its maximum number 100.
+            concurrent: if True, pages 2..N are fetched in parallel by a thread pool, still within the
+                requests-per-second budget of the shared rate limiter.
+            workers: number of threads used in concurrent mode, default 4.
+            ordered: in concurrent mode, yield the pages in page order (True, default) or as they complete (False).
+            checkpoint: a Checkpoint (or the path of one). Pages completed by a previous, interrupted crawl of
+                the search are skipped, and every page is recorded once the next one is asked for.
+            first_page: the first Page of the search if it was already fetched, ex. by a SearchPlanner.
+            revalidate: ask the site for every page even if it is fresh in the cache (see Transport.get).
+        :return: a generator of Page objects, each holding the raw html, the decoded payload and
+        the pagination metadata of a result page.
+        """
+        max_num_pages = kwargs.get('max_num_pages') or 100
+        results_per_page = 20
+        revalidate = kwargs.get('revalidate', False)
+
+        page_parsed = kwargs.get('first_page')
+        if page_parsed is None:
+            page0 = self._get_first_page(revalidate)
+            if page0 is None:
+                return
+            page_parsed = self._parse(page0, self.url)
+
+        num_results = page_parsed.num_results or 0
+
+        num_pages = num_results // results_per_page + 1
+
+        if num_pages > max_num_pages:
+            num_pages = max_num_pages
+
+        log.info("The search returned %s results.", num_results)
+        log.info("%s results in %s pages will be processed.", results_per_page * num_pages, num_pages)
+
+        current_page_num = page_parsed.page_num or 1
+
+        checkpoint = kwargs.get('checkpoint')
+        if checkpoint is not None:
+            if not isinstance(checkpoint, Checkpoint):
+                checkpoint = Checkpoint(checkpoint)
+            if checkpoint.start(self.url, num_results, num_pages):
+                log.info("Resuming %s: %s pages already done.", self.url, len(checkpoint.completed_pages))
+                if checkpoint.num_results != num_results:
+                    log.warning("The search returned %s results when the crawl started and %s now: "
+                                "ads may have moved between pages.", checkpoint.num_results, num_results)
+
+        page_nums = [n for n in range(current_page_num, num_pages + 1)
+                     if checkpoint is None or not checkpoint.is_completed(n)]
+
+        if page_nums and page_nums[0] == 1:
+            log.debug("Page %s parsed", 1)
+            first_page = [(1, page_parsed)]
+            page_nums = page_nums[1:]
+        else:
+            first_page = []
+
+        if kwargs.get('concurrent'):
+            other_pages = self._get_pages_concurrently(page_nums, workers=kwargs.get('workers') or 4,
+                                                       ordered=kwargs.get('ordered', True), revalidate=revalidate)
+        else:
+            other_pages = ((page_num, self.fetch_page(page_num, revalidate)) for page_num in page_nums)
+
+        for page_num, page in chain(first_page, other_pages):
+            yield page
+            # The consumer asked for the next page: this one is done
+            if checkpoint is not None:
+                checkpoint.complete_page(page_num, [ad.get('idannonce') for ad in page.products])
+
+        if checkpoint is not None:
+            checkpoint.finish()
+
+    def _get_pages_concurrently(self, page_nums, workers, ordered, revalidate=False):
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = {executor.submit(self.fetch_page, page_num, revalidate): page_num for page_num in page_nums}
+        try:
+            for future in (futures if ordered else as_completed(futures)):
+                yield futures[future], future.result()
+        finally:
+            # Stop fetching if the consumer stops early
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def get_results(self, max_num_pages=None, **kwargs):
+        """
+        :param
+        kwargs:
+            pages: a generator created with get_pages() (or of BeautifulSoup parsed pages). This parameter
+                overrides the other two.
+            concurrent, workers, ordered, first_page, revalidate: passed to get_pages().
+            checkpoint: a Checkpoint (or the path of one), to resume an interrupted crawl without
+                yielding again the ads it already yielded.
+            incremental: a SeenIndex (or the path of one). Only the ads that are new or whose price changed
+                since the previous runs of this search are yielded, and paging stops at the first page
+                without any new ad. Meant for searches sorted by date ({'tri': 'd_dt_crea'}). The pages are
+                revalidated with the site even if they are fresh in the cache.
+            as_records: yield Ad records, with parsed numbers and interned strings, instead of dictionaries.
+
+        max_number_pages: int, if empty it is set to its maximum number 100.
+        print_results: int, print a number per page of results for control.
+
+        :return: A generator of dictionaries each corresponding to a property ad
+        """
+        pages = kwargs.get('pages')
+        page_options = {key: kwargs[key] for key in ('concurrent', 'workers', 'ordered', 'first_page', 'revalidate')
+                        if key in kwargs}
+
+        checkpoint = kwargs.get('checkpoint')
+        if checkpoint is not None and not isinstance(checkpoint, Checkpoint):
+            checkpoint = Checkpoint(checkpoint)
+        page_options['checkpoint'] = checkpoint
+
+        seen_index = kwargs.get('incremental')
+        if seen_index is not None and not isinstance(seen_index, SeenIndex):
+            seen_index = SeenIndex(seen_index)
+        if seen_index is not None:
+            # A cached first page would hide the new ads for the whole TTL of the cache
+            page_options['revalidate'] = True
+        if seen_index is not None and self.search_params.get('tri') != 'd_dt_crea':
+            log.warning("Incremental mode on %s, which is not sorted by date ({'tri': 'd_dt_crea'}): "
+                        "new ads can be missed.", self.url)
+        search = search_key(self.url)
+        as_records = kwargs.get('as_records', False)
+
+        pages = pages or self.get_pages(max_num_pages=max_num_pages, **page_options)
+        try:
+            yield from self._results(pages, checkpoint, seen_index, search, as_records, kwargs.get('print_results'))
+        finally:
+            if checkpoint is not None:
+                # Keep the ads yielded from an unfinished page
+                checkpoint.save()
+
+    def _results(self, pages, checkpoint, seen_index, search, as_records, n):
+        for page in pages:
+
+            if isinstance(page, Page):
+                properties = page.products
+            else:
+                properties = self.get_current_parameters(False, page)['products']
+            printed_results = 0
+
+            if seen_index is not None:
+                classified = seen_index.classify(search, properties)
+                no_new_ads = all(status != NEW for ad, status in classified)
+                properties = [ad for ad, status in classified if status != SEEN]
+            if checkpoint is not None:
+                # Ads already yielded before a resume, ex. moved to a later page by new ads
+                properties = [ad for ad in properties if not checkpoint.seen(ad.get('idannonce'))]
+            self.metrics.inc('ads_total', len(properties))
+
+            for ad in properties:
+                if n:
+                    while printed_results <= n:
+                        print_results(ad)
+                        printed_results += 1
+
+                if checkpoint is not None:
+                    checkpoint.record(ad.get('idannonce'))
+                yield Ad.from_dict(ad) if as_records else ad
+
+            if seen_index is not None:
+                seen_index.record(search, [ad for ad, status in classified])
+                if no_new_ads:
+                    log.info("No new ads on this page, stopping.")
+                    if hasattr(pages, 'close'):
+                        pages.close()
+                    break
+
+    def get_enriched_results(self, max_num_pages=None, enricher=None, **kwargs):
+        """
+        Same as get_results, with the fields of the detail page of each ad added to it. Detail pages are
+        fetched in parallel while the result pages are crawled.
+        :param max_num_pages: int, if empty it is set to its maximum number 100.
+        :param enricher: an Enricher, by default one sharing the transport, rate limiter and throttle of the instance.
+        :param kwargs: passed to get_results().
+        :return: A generator of dictionaries, or of Ad records with as_records=True.
+        """
+        as_records = kwargs.pop('as_records', False)
+        enricher = enricher or Enricher(transport=self.transport, rate_limiter=self.rate_limiter, throttle=self.throttle,
+                                        metrics=self.metrics)
+        for ad in enricher.enrich(self.get_results(max_num_pages=max_num_pages, **kwargs)):
+            yield Ad.from_dict(ad) if as_records else ad
+
+    def export(self, path, max_num_pages=None, **kwargs):
+        """
+        Stream the ads of the search to a file, without holding them in memory.
+        :param path: output path, the format is given by its extension: .jsonl, .csv or .parquet,
+            optionally followed by .gz for JSON lines and CSV.
+        :param max_num_pages: int, if empty it is set to its maximum number 100.
+        :param kwargs:
+            results: an iterable of ads, ex. created with get_results(). Overrides max_num_pages.
+            batch_size, max_rows, compression: Sink parameters.
+            Other keywords are passed to get_results().
+        :return: the Sink, with the list of written files in its files attribute.
+        """
+        sink_options = {key: kwargs.pop(key) for key in ('batch_size', 'max_rows', 'compression') if key in kwargs}
+        results = kwargs.pop('results', None)
+        sink = sink_for(path, **sink_options)
+        sink.consume(results or self.get_results(max_num_pages=max_num_pages, **kwargs))
+        return sink
+
+    def results_to_dataframe(self, max_num_pages=None, **kwargs):
+        """
+        :param max_num_pages: int, if empty it is set to its maximum number 100.
+        :param kwargs:
+            results: an iterable of ads, ex. created with get_results(). Overrides max_num_pages.
+            Other keywords are DataFrameBuilder parameters (drop, schema, categorical, max_category_ratio,
+            price_per_m2).
+        :return: a DataFrame with a row per ad.
+        """
+        from .frames import ads_to_dataframe
+        results = kwargs.pop('results', None)
+        return ads_to_dataframe(results or self.get_results(max_num_pages=max_num_pages), **kwargs)
+
+    def results_to_dataframes(self, max_num_pages=None, chunk_size=1000, **kwargs):
+        """
+        Same as results_to_dataframe, in chunks.
+        :return: a generator of DataFrames of chunk_size ads.
+        """
+        from .frames import iter_dataframes
+        results = kwargs.pop('results', None)
+        return iter_dataframes(results or self.get_results(max_num_pages=max_num_pages), chunk_size, **kwargs)
+
+
+class SeLogerAchat(SelogerBase):
+    idtt = 2
+
+
+class SeLogerLocation(SelogerBase):
+    idtt = 1
+
+
+class SeLogerLocationTemporaire(SelogerBase):
+    idtt = 3
+
+
+class SeLogerLocationViager(SelogerBase):
+    idtt = 5
+
+
+class SeLogerInvestissement(SelogerBase):
+    idtt = 6
+
+
+class SeLogerLocationVacances(SelogerBase):
+    idtt = 4
+
+
+class SeLogerBiensVendus(SelogerBase):
+    base_url = "http://biens-vendus.seloger.com/list.htm?"
+    idtt = 4
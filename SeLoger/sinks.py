@@ -0,0 +1,283 @@
+import csv
+import gzip
+import json
+import logging
+import os
+from pathlib import Path
+
+from .records import Ad
+
+log = logging.getLogger(__name__)
+
+
+def _scalar(value):
+    # Lists and dictionaries of the payload are stored as JSON strings in flat formats
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class Sink(object):
+    """
+    Base class of the streaming exports of ads.
+
+    Ads are buffered by batch_size and written to a temporary '.part' file, renamed to its final
+    name once complete, so that readers never see a half-written file.
+
+    Parameters
+    ----------
+    path : str
+        Path of the output file. With max_rows, the files are numbered: 'ads.csv' becomes
+        'ads-00000.csv', 'ads-00001.csv', ...
+    batch_size : int
+        Number of ads held in memory before being written.
+    max_rows : int
+        Maximum number of ads per file, None for a single file.
+    compression : str
+        'gzip' for JSON lines and CSV, any pyarrow codec ('snappy', 'zstd', 'gzip', ...) for Parquet.
+    """
+
+    def __init__(self, path, batch_size=1000, max_rows=None, compression=None):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.compression = compression
+        self.files = []
+        self.num_rows = 0
+        self._buffer = []
+        self._file = None
+        self._part_path = None
+        self._rows_in_file = 0
+
+    def _target(self):
+        if self.max_rows is None:
+            return self.path
+        suffixes = ''.join(self.path.suffixes)
+        stem = self.path.name[:len(self.path.name) - len(suffixes)] if suffixes else self.path.name
+        return self.path.with_name(f"{stem}-{len(self.files):05d}{suffixes}")
+
+    def write(self, ad):
+        """
+        :param ad: an ad dictionary or an Ad record, written as its to_dict().
+        """
+        self._buffer.append(ad.to_dict() if isinstance(ad, Ad) else ad)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        while self._buffer:
+            if self._file is None:
+                self._part_path = self._target().with_name(self._target().name + '.part')
+                self._file = self._open(self._part_path)
+                self._rows_in_file = 0
+
+            size = len(self._buffer)
+            if self.max_rows is not None:
+                size = min(size, self.max_rows - self._rows_in_file)
+            batch, self._buffer = self._buffer[:size], self._buffer[size:]
+            self._write_batch(batch)
+            self._rows_in_file += len(batch)
+            self.num_rows += len(batch)
+
+            if self.max_rows is not None and self._rows_in_file >= self.max_rows:
+                self._finish_file()
+
+    def _finish_file(self):
+        self._close(self._file)
+        self._file = None
+        target = self._part_path.with_name(self._part_path.name[:-len('.part')])
+        os.replace(self._part_path, target)
+        self.files.append(target)
+
+    def close(self):
+        """
+        Write the buffered ads and move the current file to its final name.
+        """
+        self.flush()
+        if self._file is not None:
+            self._finish_file()
+
+    def abort(self):
+        """
+        Close the current file without publishing it: its '.part' file is removed and the buffered ads
+        are discarded. Files completed before, with max_rows, are kept.
+        """
+        self._buffer = []
+        if self._file is not None:
+            self._close(self._file)
+            self._file = None
+            self._part_path.unlink(missing_ok=True)
+            log.warning('Export to %s interrupted, %s removed.', self.path, self._part_path)
+
+    def consume(self, ads):
+        """
+        Write all the ads of an iterable, ex. get_results(), and close the sink. If the iterable raises,
+        the incomplete file is removed instead of being moved to its final name.
+        :return: the number of ads written.
+        """
+        with self:
+            for ad in ads:
+                self.write(ad)
+        return self.num_rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _open(self, path):
+        raise NotImplementedError
+
+    def _write_batch(self, ads):
+        raise NotImplementedError
+
+    def _close(self, file):
+        file.close()
+
+
+class JSONLinesSink(Sink):
+    """
+    Write ads as JSON lines, one ad per line.
+    """
+
+    def _open(self, path):
+        if self.compression == 'gzip':
+            return gzip.open(path, 'wt', encoding='utf-8')
+        return open(path, 'w', encoding='utf-8')
+
+    def _write_batch(self, ads):
+        self._file.writelines(json.dumps(ad, ensure_ascii=False) + '\n' for ad in ads)
+
+
+class CSVSink(Sink):
+    """
+    Write ads as CSV. The columns are the keys of the first batch of ads, in order of appearance;
+    keys appearing later are left out. Lists and dictionaries are written as JSON.
+    """
+
+    def __init__(self, path, fieldnames=None, **kwargs):
+        super(CSVSink, self).__init__(path, **kwargs)
+        self.fieldnames = fieldnames
+        self._writer = None
+        self._dropped = set()
+
+    def _open(self, path):
+        if self.compression == 'gzip':
+            file = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        else:
+            file = open(path, 'w', encoding='utf-8', newline='')
+        self._writer = None
+        return file
+
+    def _write_batch(self, ads):
+        if self.fieldnames is None:
+            self.fieldnames = list(dict.fromkeys(key for ad in ads for key in ad))
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._file, self.fieldnames, restval='', extrasaction='ignore')
+            self._writer.writeheader()
+
+        for ad in ads:
+            dropped = ad.keys() - set(self.fieldnames) - self._dropped
+            if dropped:
+                log.warning('Columns %s are not in the CSV schema and are left out.', sorted(dropped))
+                self._dropped.update(dropped)
+            self._writer.writerow({key: _scalar(value) for key, value in ad.items()})
+
+
+class ParquetSink(Sink):
+    """
+    Write ads as Parquet, one row group per batch. Requires pyarrow.
+
+    The schema is derived from the first batch: boolean fields stay boolean, every other field is
+    stored as a string (the payload values are strings). Keys appearing later are left out.
+    """
+
+    def __init__(self, path, schema=None, **kwargs):
+        import pyarrow
+        import pyarrow.parquet
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        super(ParquetSink, self).__init__(path, **kwargs)
+        self.schema = schema
+
+    def _derive_schema(self, ads):
+        types = {}
+        for ad in ads:
+            for key, value in ad.items():
+                if value is None:
+                    types.setdefault(key, None)
+                elif isinstance(value, bool) and types.get(key) in (None, self._pa.bool_()):
+                    types[key] = self._pa.bool_()
+                else:
+                    types[key] = self._pa.string()
+        return self._pa.schema([(key, value_type or self._pa.string()) for key, value_type in types.items()])
+
+    def _row(self, ad):
+        row = {}
+        for field in self.schema:
+            value = ad.get(field.name)
+            if value is not None and field.type == self._pa.string():
+                value = _scalar(value)
+                value = value if isinstance(value, str) else str(value)
+            row[field.name] = value
+        return row
+
+    def _open(self, path):
+        return _LazyParquetWriter(self, path)
+
+    def _write_batch(self, ads):
+        if self.schema is None:
+            self.schema = self._derive_schema(ads)
+        table = self._pa.Table.from_pylist([self._row(ad) for ad in ads], schema=self.schema)
+        self._file.write_table(table)
+
+
+class _LazyParquetWriter(object):
+    # The schema is only known once the first batch is seen
+
+    def __init__(self, sink, path):
+        self.sink = sink
+        self.path = path
+        self.writer = None
+
+    def write_table(self, table):
+        if self.writer is None:
+            self.writer = self.sink._pq.ParquetWriter(str(self.path), self.sink.schema,
+                                                      compression=self.sink.compression or 'snappy')
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+SINKS = {
+    '.jsonl': JSONLinesSink,
+    '.json': JSONLinesSink,
+    '.ndjson': JSONLinesSink,
+    '.csv': CSVSink,
+    '.parquet': ParquetSink,
+}
+
+
+def sink_for(path, **kwargs):
+    """
+    :param path: output path, the format is given by its extension (.jsonl, .csv or .parquet,
+    optionally followed by .gz for JSON lines and CSV).
+    :param kwargs: Sink parameters.
+    :return: a Sink.
+    """
+    path = Path(path)
+    suffixes = [suffix.lower() for suffix in path.suffixes]
+    if suffixes and suffixes[-1] == '.gz':
+        kwargs.setdefault('compression', 'gzip')
+        suffixes = suffixes[:-1]
+    try:
+        sink_class = SINKS[suffixes[-1]]
+    except (IndexError, KeyError):
+        raise ValueError(f"Cannot guess the format of {path}, use one of the extensions {sorted(SINKS)}")
+    return sink_class(path, **kwargs)
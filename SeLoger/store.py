@@ -0,0 +1,195 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from time import time
+
+from .parsing import to_float
+from .records import Ad
+
+TRACKED_FIELDS = ('prix', 'surface', 'nb_pieces', 'nb_chambres')
+
+# Keep the number of bound variables under the SQLite default limit
+_MAX_VARIABLES = 500
+
+
+class AdStore(object):
+    """
+    Local SQLite store of ads, updated by idannonce, with the history of their changes.
+
+    Table ads holds the last version of every ad (its payload as JSON, plus cp, ville, prix and surface
+    columns, indexed), table ad_history one row per change of a tracked field.
+
+    Parameters
+    ----------
+    path : str
+        Path of the database file.
+    tracked_fields : iterable
+        Fields whose changes are recorded in ad_history.
+    """
+
+    def __init__(self, path='seloger-ads.sqlite', tracked_fields=TRACKED_FIELDS):
+        self.path = Path(path)
+        self.tracked_fields = tuple(tracked_fields)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._db:
+            self._db.executescript('''
+                CREATE TABLE IF NOT EXISTS ads (
+                    idannonce TEXT PRIMARY KEY,
+                    cp TEXT,
+                    ville TEXT,
+                    prix REAL,
+                    surface REAL,
+                    data TEXT,
+                    first_seen REAL,
+                    last_seen REAL);
+                CREATE INDEX IF NOT EXISTS ads_cp ON ads (cp);
+                CREATE INDEX IF NOT EXISTS ads_prix ON ads (prix);
+                CREATE INDEX IF NOT EXISTS ads_surface ON ads (surface);
+                CREATE INDEX IF NOT EXISTS ads_last_seen ON ads (last_seen);
+                CREATE TABLE IF NOT EXISTS ad_history (
+                    idannonce TEXT,
+                    field TEXT,
+                    old_value TEXT,
+                    new_value TEXT,
+                    old_number REAL,
+                    new_number REAL,
+                    changed_at REAL);
+                CREATE INDEX IF NOT EXISTS ad_history_idannonce ON ad_history (idannonce, changed_at);
+                CREATE INDEX IF NOT EXISTS ad_history_field ON ad_history (field, changed_at);
+            ''')
+
+    def _existing(self, ids):
+        existing = {}
+        for start in range(0, len(ids), _MAX_VARIABLES):
+            chunk = ids[start:start + _MAX_VARIABLES]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self._db.execute(f'SELECT idannonce, data FROM ads WHERE idannonce IN ({placeholders})', chunk)
+            existing.update((key, json.loads(data)) for key, data in rows)
+        return existing
+
+    def _upsert_batch(self, batch, crawled_at):
+        # The last version of an ad wins within a batch
+        ads = {str(ad['idannonce']): ad for ad in batch}
+        with self._lock, self._db:
+            existing = self._existing(list(ads))
+
+            history = []
+            for key, ad in ads.items():
+                old = existing.get(key)
+                if old is None:
+                    continue
+                for field in self.tracked_fields:
+                    old_value, new_value = old.get(field), ad.get(field)
+                    if old_value != new_value:
+                        history.append((key, field, _text(old_value), _text(new_value),
+                                        to_float(old_value), to_float(new_value), crawled_at))
+
+            self._db.executemany('INSERT INTO ad_history VALUES (?, ?, ?, ?, ?, ?, ?)', history)
+            self._db.executemany('''INSERT INTO ads VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (idannonce) DO UPDATE SET cp = excluded.cp, ville = excluded.ville, prix = excluded.prix,
+                surface = excluded.surface, data = excluded.data, last_seen = excluded.last_seen''',
+                                 [(key, _text(ad.get('cp')), _text(ad.get('ville')), to_float(ad.get('prix')),
+                                   to_float(ad.get('surface')), json.dumps(ad, ensure_ascii=False), crawled_at,
+                                   crawled_at)
+                                  for key, ad in ads.items()])
+        return len(ads) - len(existing), len(existing), len(history)
+
+    def upsert(self, ads, batch_size=1000, crawled_at=None):
+        """
+        Insert or update ads by idannonce, one transaction per batch.
+        :param ads: an iterable of ad dictionaries or Ad records, ex. get_results(). Records are stored as
+        their to_dict(), with parsed numbers.
+        :param batch_size: number of ads per transaction.
+        :param crawled_at: timestamp of the crawl, now by default.
+        :return: a dictionary with the number of inserted and updated ads and of recorded changes.
+        """
+        crawled_at = crawled_at or time()
+        counts = {'inserted': 0, 'updated': 0, 'changes': 0}
+        batch = []
+        for ad in ads:
+            batch.append(ad.to_dict() if isinstance(ad, Ad) else ad)
+            if len(batch) >= batch_size:
+                self._add_counts(counts, self._upsert_batch(batch, crawled_at))
+                batch = []
+        if batch:
+            self._add_counts(counts, self._upsert_batch(batch, crawled_at))
+        return counts
+
+    consume = upsert
+
+    @staticmethod
+    def _add_counts(counts, batch_counts):
+        for key, value in zip(('inserted', 'updated', 'changes'), batch_counts):
+            counts[key] += value
+
+    def get(self, idannonce):
+        """
+        :return: the last version of an ad, or None.
+        """
+        with self._lock:
+            row = self._db.execute('SELECT data FROM ads WHERE idannonce = ?', (str(idannonce),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def ads(self, cp=None, min_price=None, max_price=None, min_surface=None, max_surface=None, seen_since=None):
+        """
+        :return: a list of the stored ads matching all the given criteria.
+        """
+        conditions, params = [], []
+        for condition, value in (('cp = ?', cp), ('prix >= ?', min_price), ('prix <= ?', max_price),
+                                 ('surface >= ?', min_surface), ('surface <= ?', max_surface),
+                                 ('last_seen >= ?', seen_since)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+        with self._lock:
+            rows = self._db.execute('SELECT data FROM ads' + where, params).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def history(self, idannonce, field=None):
+        """
+        :return: the list of (field, old_value, new_value, changed_at) changes of an ad, oldest first.
+        """
+        query = 'SELECT field, old_value, new_value, changed_at FROM ad_history WHERE idannonce = ?'
+        params = [str(idannonce)]
+        if field is not None:
+            query += ' AND field = ?'
+            params.append(field)
+        with self._lock:
+            return self._db.execute(query + ' ORDER BY changed_at', params).fetchall()
+
+    def price_drops(self, since=None):
+        """
+        :return: the list of (idannonce, old_price, new_price, changed_at) price drops, most recent first.
+        """
+        query = ("SELECT idannonce, old_number, new_number, changed_at FROM ad_history "
+                 "WHERE field = 'prix' AND new_number < old_number")
+        params = []
+        if since is not None:
+            query += ' AND changed_at >= ?'
+            params.append(since)
+        with self._lock:
+            return self._db.execute(query + ' ORDER BY changed_at DESC', params).fetchall()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM ads').fetchone()[0]
+
+    def to_dataframe(self, **kwargs):
+        """
+        :param kwargs: criteria of ads().
+        :return: a normalised DataFrame of the stored ads.
+        """
+        from .frames import ads_to_dataframe
+        return ads_to_dataframe(self.ads(**kwargs))
+
+    def close(self):
+        self._db.close()
+
+
+def _text(value):
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
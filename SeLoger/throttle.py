@@ -0,0 +1,242 @@
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from time import monotonic, sleep, time
+from urllib.parse import urlsplit
+
+from .metrics import metrics as default_metrics
+from .ratelimit import TokenBucket
+
+log = logging.getLogger(__name__)
+
+THROTTLE_STATUSES = (429, 503)
+
+
+def retry_after_seconds(value):
+    """
+    :param value: a Retry-After header, in seconds or as an HTTP date.
+    :return: the number of seconds to wait, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _host(url):
+    return urlsplit(url).netloc or url
+
+
+class _HostState(object):
+
+    def __init__(self, rate):
+        self.bucket = TokenBucket(rate)
+        self.paused_until = 0.0
+        self.blocks = 0
+
+
+class AdaptiveThrottle(object):
+    """
+    Per-host request rate driven by the responses of the server (AIMD): the rate grows by a fixed step
+    after every fast successful response, and is multiplied by decrease on HTTP 429/503, connection
+    errors and robots pages. Responses slower than target_latency lower it gently.
+
+    A Retry-After header pauses the host for the time asked, and robots pages pause it for pause
+    seconds, doubled at each consecutive block up to max_pause. Requests wait for the pause to end
+    instead of failing.
+
+    Parameters
+    ----------
+    rate : float
+        Initial number of requests per second of each host.
+    min_rate : float
+        The rate never goes below this.
+    max_rate : float
+        The rate never goes above this.
+    increase : float
+        Requests per second added after a fast successful response.
+    decrease : float
+        Factor applied to the rate on a throttling response, an error or a robots page.
+    target_latency : float
+        Responses slower than this, in seconds, do not increase the rate but lower it by (1 + decrease) / 2.
+    pause : float
+        Pause after a robots page, in seconds.
+    max_pause : float
+        Longest pause after consecutive robots pages, in seconds.
+    metrics : Metrics
+        Registry receiving the throttle metrics, the process-wide one by default.
+    """
+
+    def __init__(self, rate=1 / 3, min_rate=1 / 120, max_rate=2.0, increase=0.05, decrease=0.5, target_latency=2.0,
+                 pause=60.0, max_pause=1800.0, metrics=None):
+        self.initial_rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.target_latency = target_latency
+        self.pause_seconds = pause
+        self.max_pause = max_pause
+        self.metrics = metrics or default_metrics
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, url):
+        host = _host(url)
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _HostState(self.initial_rate)
+        return state
+
+    def rate(self, url):
+        """
+        :param url: an url or a host name.
+        :return: the current number of requests per second of the host.
+        """
+        return self._state(url).bucket.rate
+
+    def rates(self):
+        """
+        :return: a dictionary host: current rate.
+        """
+        with self._lock:
+            return {host: state.bucket.rate for host, state in self._hosts.items()}
+
+    def paused_for(self, url):
+        """
+        :return: the number of seconds left before the host is resumed, 0 if it is not paused.
+        """
+        return max(0.0, self._state(url).paused_until - monotonic())
+
+    def acquire(self, url):
+        """
+        Block until a request can be sent to the host of url, pauses included.
+        :return: the number of seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            pause = self.paused_for(url)
+            if not pause:
+                break
+            sleep(pause)
+            waited += pause
+        return waited + self._state(url).bucket.acquire()
+
+    def reserve(self, url):
+        """
+        Same as acquire, without blocking.
+        :return: the number of seconds to wait before sending the request.
+        """
+        pause = self.paused_for(url)
+        return pause + self._state(url).bucket.reserve()
+
+    def _set_rate(self, url, rate, reason=None):
+        state = self._state(url)
+        rate = min(self.max_rate, max(self.min_rate, rate))
+        if reason is not None and rate < state.bucket.rate:
+            self.metrics.inc('throttle_decreases_total', reason=reason)
+            log.info('Throttling %s to %.3f requests/s (%s).', _host(url), rate, reason)
+        state.bucket.set_rate(rate)
+        return state
+
+    def pause(self, url, seconds):
+        """
+        Stop sending requests to the host of url for seconds, or longer if it is already paused for longer.
+        """
+        state = self._state(url)
+        state.paused_until = max(state.paused_until, monotonic() + seconds)
+        self.metrics.inc('throttle_pauses_total')
+        log.warning('Pausing requests to %s for %.1f s.', _host(url), seconds)
+
+    def resume(self, url):
+        self._state(url).paused_until = 0.0
+
+    def success(self, url, latency):
+        state = self._state(url)
+        if latency > self.target_latency:
+            self._set_rate(url, state.bucket.rate * (1 + self.decrease) / 2, 'slow')
+        else:
+            self._set_rate(url, state.bucket.rate + self.increase)
+
+    def throttled(self, url, retry_after=None, reason='throttled'):
+        """
+        Lower the rate of the host after a throttling response or an error, and pause it for retry_after seconds.
+        """
+        state = self._set_rate(url, self._state(url).bucket.rate * self.decrease, reason)
+        if retry_after:
+            self.pause(url, retry_after)
+        return state
+
+    def blocked(self, url):
+        """
+        Lower the rate of the host after a robots page and pause it, longer after each consecutive block.
+        :return: the length of the pause, in seconds.
+        """
+        state = self.throttled(url, reason='blocked')
+        state.blocks += 1
+        seconds = min(self.max_pause, self.pause_seconds * 2 ** (state.blocks - 1))
+        self.pause(url, seconds)
+        return seconds
+
+    def valid_page(self, url):
+        """
+        Reset the count of consecutive robots pages of the host. Robots pages are served with HTTP 200:
+        only the caller can tell a valid page.
+        """
+        self._state(url).blocks = 0
+
+    def record(self, url, status=None, latency=0.0, retry_after=None):
+        """
+        Update the rate of the host from a response.
+        :param status: the HTTP status, None if the request failed.
+        :param latency: the duration of the request, in seconds.
+        :param retry_after: the Retry-After header of the response.
+        """
+        if status is None:
+            self.throttled(url, reason='error')
+        elif status in THROTTLE_STATUSES:
+            self.throttled(url, retry_after_seconds(retry_after), reason=f'http_{status}')
+        elif status < 400:
+            self.success(url, latency)
+
+
+_shared_throttle = None
+_shared_lock = threading.Lock()
+
+
+def shared_throttle(delay, metrics=None):
+    """
+    :param delay: number of seconds between requests wanted by the caller, before any adaptation.
+    :param metrics: registry of the throttle metrics, used when the throttle is created.
+    :return: the process-wide AdaptiveThrottle shared by the SeLoger instances created with throttle=True,
+    so that they share the rate of each host. Hosts start at the most conservative rate asked for so far,
+    one request every delay seconds.
+    """
+    global _shared_throttle
+    with _shared_lock:
+        if _shared_throttle is None:
+            _shared_throttle = AdaptiveThrottle(rate=1 / delay, metrics=metrics)
+        else:
+            _shared_throttle.initial_rate = min(_shared_throttle.initial_rate, 1 / delay)
+        return _shared_throttle
+
+
+def resolve_throttle(throttle, transport, delay, metrics):
+    """
+    :return: the throttle of a search: the one of its transport if it has one, as a throttle only learns
+    from the responses of its transport, otherwise the one given, or the process-wide one for True.
+    """
+    if transport is not None and transport.throttle is not None:
+        if throttle not in (None, False, True, transport.throttle):
+            log.warning('The transport already has a throttle: it is used instead of the one given.')
+        return transport.throttle
+    if throttle is True:
+        return shared_throttle(delay, metrics=metrics)
+    return throttle
@@ -0,0 +1,210 @@
+import logging
+import random
+import threading
+from time import perf_counter, sleep
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+
+from .metrics import metrics as default_metrics
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_9_2) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/34.0.1847.131 Safari/537.36'
+
+log = logging.getLogger(__name__)
+
+
+class Transport(object):
+    """
+    Shared HTTP layer used by every fetch path of the SeLoger classes.
+
+    A single requests.Session is kept for the lifetime of the transport, so
+    connections (and cookies) are reused between result pages instead of
+    paying a new TCP+TLS handshake for every request.
+
+    Parameters
+    ----------
+    pool_connections : int
+        Number of per-host connection pools to cache.
+    pool_maxsize : int
+        Maximum number of connections kept alive in each pool.
+    max_per_host : int
+        Maximum number of requests in flight at the same time towards a host.
+    keep_alive : bool
+        Reuse connections between requests. If False, 'Connection: close' is sent.
+    timeout : float or tuple
+        Requests timeout in seconds, either a single value or (connect, read).
+    max_retries : int
+        Number of retries after the first attempt, on connection errors,
+        timeouts and on the status codes listed in retry_statuses.
+    backoff_factor : float
+        Base of the exponential backoff, in seconds. The wait before retry n is
+        drawn uniformly between 0 and min(backoff_max, backoff_factor * 2 ** n).
+    backoff_max : float
+        Upper bound of the backoff, in seconds.
+    retry_statuses : tuple
+        HTTP status codes that are retried.
+    headers : dict
+        Extra headers sent with every request.
+    cache : ResponseCache
+        Optional persistent cache of the successful responses, revalidated once expired.
+    metrics : Metrics
+        Registry receiving the request metrics, the process-wide one by default.
+    throttle : AdaptiveThrottle
+        Optional per-host rate controller, told the status and latency of every response. With a
+        throttle, HTTP 429 is retried too and retries wait for the throttle instead of the backoff.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, max_per_host=4, keep_alive=True, timeout=(10, 30),
+                 max_retries=3, backoff_factor=1.0, backoff_max=60.0, retry_statuses=(500, 502, 503, 504),
+                 headers=None, cache=None, metrics=None, throttle=None):
+        self.cache = cache
+        self.throttle = throttle
+        self.metrics = metrics or default_metrics
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.retry_statuses = frozenset(retry_statuses)
+        self.max_per_host = max_per_host
+
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+        if headers:
+            self.session.headers.update(headers)
+
+        # Retries are handled here, with backoff, not by urllib3
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _slots(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            slots = self._host_slots.get(host)
+            if slots is None:
+                slots = threading.BoundedSemaphore(self.max_per_host)
+                self._host_slots[host] = slots
+        return slots
+
+    def backoff(self, attempt):
+        """
+        :param attempt: number of the failed attempt, starting from 0.
+        :return: the number of seconds to wait before the next attempt (full jitter).
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * 2 ** attempt))
+
+    def get(self, url, logger=None, wait=None, revalidate=False, **kwargs):
+        """
+        GET an url, retrying with exponential backoff on connection errors,
+        timeouts and retryable status codes.
+        :param url: the url to get.
+        :param logger: logger used to report retries, defaults to this module's logger.
+        :param wait: function called before the request is sent to the site, ex. to wait for a rate
+        limiter. It is not called when a fresh cached response is returned, but is before a revalidation.
+        :param revalidate: ask the site even if the cached response is fresh, with If-None-Match/If-Modified-Since
+        when possible, ex. to look for new ads.
+        :param kwargs: passed to requests.Session.get.
+        :return: a requests.Response, or a CachedResponse if the url is cached. The last
+        response is returned if a retryable status is still received after max_retries.
+        """
+        if self.cache is None or kwargs.get('params'):
+            if wait is not None:
+                wait()
+            return self._get(url, logger, **kwargs)
+
+        cached = self.cache.get(url)
+        if cached is not None:
+            if not revalidate and self.cache.is_fresh(cached):
+                self.metrics.inc('cache_hits_total')
+                return cached
+            validators = cached.validators()
+            if validators:
+                kwargs['headers'] = dict(kwargs.get('headers') or {}, **validators)
+
+        if wait is not None:
+            wait()
+        response = self._get(url, logger, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            self.metrics.inc('cache_revalidations_total')
+            self.cache.touch(url)
+            return cached
+        if response.status_code == 200:
+            self.cache.set(url, response.status_code, response.headers, response.content)
+        return response
+
+    def forget(self, url):
+        """
+        Remove an url from the cache, ex. when the response turned out to be a robots page.
+        """
+        if self.cache is not None:
+            self.cache.invalidate(url)
+
+    def _get(self, url, logger=None, **kwargs):
+        logger = logger or log
+        kwargs.setdefault('timeout', self.timeout)
+        slots = self._slots(url)
+
+        attempt = 0
+        while True:
+            start = perf_counter()
+            try:
+                with slots, self.metrics.timer('fetch_seconds'):
+                    response = self.session.get(url, **kwargs)
+            except RequestException as exc:
+                self.metrics.inc('request_errors_total')
+                if self.throttle is not None:
+                    self.throttle.record(url)
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning('Request to %s failed (%s). Retrying ...', url, exc)
+            else:
+                self.metrics.inc('requests_total', status=response.status_code)
+                self.metrics.inc('bytes_downloaded_total', len(response.content))
+                if self.throttle is not None:
+                    self.throttle.record(url, response.status_code, perf_counter() - start,
+                                         response.headers.get('Retry-After'))
+                if not self._retryable(response.status_code) or attempt >= self.max_retries:
+                    return response
+                logger.warning('Request to %s returned HTTP %s. Retrying ...', url, response.status_code)
+                response.close()
+
+            self.metrics.inc('retries_total')
+            if self.throttle is not None:
+                self.metrics.observe('rate_limiter_wait_seconds', self.throttle.acquire(url))
+            else:
+                sleep(self.backoff(attempt))
+            attempt += 1
+
+    def _retryable(self, status):
+        return status in self.retry_statuses or (self.throttle is not None and status == 429)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+
+def default_transport():
+    """
+    :return: the process-wide Transport used when none is given explicitly.
+    """
+    global _default_transport
+    with _default_lock:
+        if _default_transport is None:
+            _default_transport = Transport()
+    return _default_transport
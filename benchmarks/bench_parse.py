@@ -0,0 +1,90 @@
+"""
+Per-page parse CPU time and peak memory of the legacy pipeline against the parser backends.
+
+Usage:
+    python benchmarks/bench_parse.py [page1.html page2.html ...] [--repeat 20]
+
+Without pages, the fixtures (recorded or generated) are used.
+
+The legacy pipeline is the one get_pages/get_results used before pages were parsed once:
+a BeautifulSoup tree, regexes over its text for nbresults/nbpage, then a prettify of the
+main block, NFKD-normalised and minified, and an eval of the payload.
+"""
+import argparse
+import re
+import sys
+import tracemalloc
+from pathlib import Path
+from time import process_time
+from unicodedata import normalize
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from SeLoger.parsing import PARSERS, parse_page  # noqa: E402
+from fixtures import sample_pages  # noqa: E402
+
+try:
+    # Raised by BeautifulSoup when a tree builder, ex. lxml, is not installed
+    from bs4 import FeatureNotFound
+except ImportError:
+    FeatureNotFound = ImportError
+
+
+def legacy(content):
+    # The steps of get_pages and get_current_parameters before pages were parsed once
+    from bs4 import BeautifulSoup
+    page_parsed = BeautifulSoup(content, 'html.parser')
+    try:
+        page_parsed.find('meta').attrs['name'] == 'robots'
+    except KeyError:
+        pass
+    re.search(r'\s?"nbresults"\s+:\s? "(\d+[^"]*)"', page_parsed.text)
+    re.search(r'\s?"nbpage"\s+:\s? "(\d+[^"]*)"', page_parsed.text)
+    page_data = page_parsed.find('div', {'class': 'c-wrap-main'})
+    page_data_str = normalize('NFKD', page_data.prettify())
+    page_data_str_minified = page_data_str.replace('\n', '').replace('\r', '').replace(' ', '').replace(
+        "true", "True").replace("false", "False")
+    json_str = re.search('({.*});ava.*', page_data_str_minified).group(1)
+    # The fixtures are generated or recorded locally
+    return eval(json_str)
+
+
+def measure(parse, pages, repeat):
+    start = process_time()
+    for _ in range(repeat):
+        for content in pages:
+            parse(content)
+    cpu = (process_time() - start) / (repeat * len(pages))
+
+    peak = 0
+    for content in pages:
+        tracemalloc.start()
+        parse(content)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return cpu, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pages', nargs='*', type=Path)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    pages = [path.read_bytes() for path in args.pages] or sample_pages()
+    candidates = {'legacy': legacy}
+    for name in PARSERS:
+        candidates[name] = lambda content, name=name: parse_page(content, name)
+
+    print(f"{'pipeline':<12} {'CPU ms/page':>12} {'peak KiB':>10}")
+    for name, parse in candidates.items():
+        try:
+            cpu, peak = measure(parse, pages, args.repeat)
+        except (ImportError, FeatureNotFound) as exc:
+            print(f"{name:<12} skipped ({exc})")
+            continue
+        print(f"{name:<12} {cpu * 1000:>12.2f} {peak / 1024:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
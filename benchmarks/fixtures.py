@@ -0,0 +1,119 @@
+"""
+Result pages used by the benchmarks.
+
+Pages recorded from seloger.com with record.py are stored in fixtures/<name>/page-<n>.html. When a
+search has no recorded page, or more pages are asked than recorded, pages with the same structure
+(a 'c-wrap-main' block holding the ava_data payload) are generated deterministically.
+"""
+import json
+import random
+from pathlib import Path
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+RESULTS_PER_PAGE = 20
+
+PAGE_TEMPLATE = '''<!DOCTYPE html>
+<html lang="fr">
+<head>
+<meta charset="utf-8">
+<title>Annonces immobilieres</title>
+<link rel="stylesheet" href="/styles.css">
+</head>
+<body>
+<header class="c-header"><nav>{navigation}</nav></header>
+<div class="c-wrap-main">
+<section class="c-pa-list">{listing}</section>
+<script type="text/javascript">
+var ava_data = {payload};
+ava_data.logged = false;
+</script>
+</div>
+<footer class="c-footer">{footer}</footer>
+</body>
+</html>
+'''
+
+ROBOTS_PAGE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta name="robots" content="noindex, nofollow">
+<title>Pardon Our Interruption</title>
+</head>
+<body><p>As you were browsing something about your browser made us think you were a bot.</p></body>
+</html>
+'''
+
+CITIES = [('75015', 'Paris 15eme'), ('75011', 'Paris 11eme'), ('75018', 'Paris 18eme'), ('92100', 'Boulogne-Billancourt'),
+          ('69003', 'Lyon 3eme'), ('13008', 'Marseille 8eme'), ('33000', 'Bordeaux'), ('31000', 'Toulouse')]
+TYPES = ['Appartement', 'Maison', 'Loft', 'Duplex', 'Studio']
+
+
+def _french_number(value):
+    return f"{value:,}".replace(',', '\xa0')
+
+
+def make_ad(rng, idannonce):
+    cp, ville = rng.choice(CITIES)
+    surface = round(rng.uniform(12, 180), 1)
+    rooms = max(1, int(surface // 25))
+    return {
+        'idannonce': str(idannonce),
+        'idagence': str(rng.randint(1000, 99999)),
+        'typedebien': rng.choice(TYPES),
+        'typedetransaction': ['vente'],
+        'position': str(idannonce % RESULTS_PER_PAGE),
+        'produitsvisibilite': 'AD:AC:BX:AW',
+        'affichagetype': [{'name': 'list', 'value': True}],
+        'idtypepublicationsourcecouplage': 'SL',
+        'cp': cp,
+        'ville': ville,
+        'etage': str(rng.randint(0, 9)),
+        'nb_pieces': str(rooms),
+        'nb_chambres': str(max(0, rooms - 1)),
+        'nb_photos': str(rng.randint(0, 20)),
+        'si_balcon': rng.choice(['0', '1']),
+        'prix': _french_number(int(surface * rng.uniform(4000, 12000)) // 1000 * 1000),
+        'surface': str(surface).replace('.', ','),
+        'dtcreation': f"2018-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+    }
+
+
+def make_page(page_num, num_results, seed=0):
+    """
+    :return: the html (bytes) of result page page_num of a search returning num_results ads.
+    """
+    rng = random.Random(seed * 1000003 + page_num)
+    first = (page_num - 1) * RESULTS_PER_PAGE
+    count = max(0, min(RESULTS_PER_PAGE, num_results - first))
+    ads = [make_ad(rng, 100000000 + seed * 100000 + first + n) for n in range(count)]
+    payload = {
+        'search': {'nbresults': _french_number(num_results), 'nbpage': str(page_num), 'tri': 'd_dt_crea'},
+        'products': ads,
+    }
+    listing = ''.join(f'<div class="c-pa-list c-pa-sl"><a href="/annonces/{ad["idannonce"]}.htm">'
+                      f'<div class="c-pa-price">{ad["prix"]} &euro;</div>'
+                      f'<div class="c-pa-criterion"><em>{ad["nb_pieces"]} p</em><em>{ad["surface"]} m&sup2;</em></div>'
+                      f'<div class="c-pa-city">{ad["ville"]}</div></a></div>' for ad in ads)
+    navigation = ''.join(f'<a href="/list.htm?p={n}">{n}</a>' for n in range(1, 40))
+    footer = ''.join(f'<a href="/ville/{ville}">{ville}</a>' for _, ville in CITIES * 10)
+    html = PAGE_TEMPLATE.format(payload=json.dumps(payload, ensure_ascii=False, indent=2, separators=(',', ' : ')),
+                                listing=listing, navigation=navigation, footer=footer)
+    return html.encode('utf-8')
+
+
+def recorded_pages(name):
+    """
+    :return: a dictionary page number: html of the pages recorded under fixtures/<name>.
+    """
+    directory = FIXTURES_DIR / name
+    if not directory.is_dir():
+        return {}
+    return {int(path.stem.split('-')[1]): path.read_bytes() for path in directory.glob('page-*.html')}
+
+
+def sample_pages(num_pages=5, num_results=2000):
+    """
+    :return: a list of html pages to benchmark parsing: the recorded ones if any, generated ones otherwise.
+    """
+    pages = [path.read_bytes() for path in sorted(FIXTURES_DIR.glob('*/page-*.html'))]
+    return pages or [make_page(n, num_results) for n in range(1, num_pages + 1)]
@@ -0,0 +1,46 @@
+"""
+Record result pages of a live seloger.com search as benchmark fixtures.
+
+Usage:
+    python benchmarks/record.py paris15 "cp=75015&idtypebien=1" --pages 3 --delay 5
+
+Pages are saved to benchmarks/fixtures/<name>/page-<n>.html.
+"""
+import argparse
+import sys
+from pathlib import Path
+from time import sleep
+from urllib.parse import parse_qsl
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from SeLoger import SeLogerAchat, is_blocked  # noqa: E402
+from fixtures import FIXTURES_DIR  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('name')
+    parser.add_argument('query', help="search parameters as an url query, ex. 'cp=75015&idtypebien=1'")
+    parser.add_argument('--pages', type=int, default=3)
+    parser.add_argument('--delay', type=float, default=5)
+    args = parser.parse_args()
+
+    search = SeLogerAchat(dict(parse_qsl(args.query)))
+    directory = FIXTURES_DIR / args.name
+    directory.mkdir(parents=True, exist_ok=True)
+
+    for page_num in range(1, args.pages + 1):
+        if page_num > 1:
+            sleep(args.delay)
+        content = search.transport.get(search.page_url(page_num)).content
+        if is_blocked(content):
+            print(f"Page {page_num} is a robots page, stopping.")
+            break
+        path = directory / f"page-{page_num}.html"
+        path.write_bytes(content)
+        print(f"Saved {path} ({len(content)} bytes)")
+
+
+if __name__ == '__main__':
+    main()
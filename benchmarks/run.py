@@ -0,0 +1,140 @@
+"""
+Offline benchmarks of the crawler against the local stand-in server.
+
+For each scenario, reports crawl throughput (pages/s, ads/s), parse CPU per page, peak memory of
+the crawl and DataFrame build time.
+
+Usage:
+    python benchmarks/run.py
+    python benchmarks/run.py --latency 0.05 --concurrent --workers 8
+    python benchmarks/run.py --output bench.json
+    python benchmarks/run.py --baseline bench.json --tolerance 0.2   # exit 1 on regression
+"""
+import argparse
+import json
+import logging
+import sys
+import tracemalloc
+from pathlib import Path
+from time import perf_counter, process_time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from SeLoger import AdaptiveThrottle, SeLogerAchat, TokenBucket, ads_to_dataframe, parse_page  # noqa: E402
+from server import StandInServer  # noqa: E402
+
+# name: (nbresults of the search, pages crawled, server blocks every n-th request)
+SCENARIOS = {
+    'small': (100, 5, 0),
+    'medium': (1000, 50, 0),
+    'large': (2000, 100, 0),
+    'robots': (2000, 100, 10),
+}
+
+# metric: True if higher is better
+METRICS = {
+    'pages_per_s': True,
+    'ads_per_s': True,
+    'parse_ms_per_page': False,
+    'peak_mib': False,
+    'dataframe_s': False,
+}
+
+
+def crawl(server, max_num_pages, options, parser):
+    throttle = None
+    if server.block_every:
+        # Robots pages are retried at once, to measure the cost of the retries and not of the pauses
+        throttle = AdaptiveThrottle(rate=1e9, max_rate=1e9, min_rate=1e9, pause=0.0, max_pause=0.0)
+    search = SeLogerAchat({'cp': '75', 'tri': 'd_dt_crea'}, base_url=server.base_url, parser=parser,
+                          rate_limiter=TokenBucket(1e9, 1e9), throttle=throttle)
+    return list(search.get_results(max_num_pages=max_num_pages, **options))
+
+
+def run_scenario(num_results, max_num_pages, block_every, latency, options, parser):
+    result = {}
+    with StandInServer(num_results=num_results, latency=latency, block_every=block_every) as server:
+        start = perf_counter()
+        ads = crawl(server, max_num_pages, options, parser)
+        elapsed = perf_counter() - start
+        pages = server.requests
+        result['pages'] = pages
+        result['ads'] = len(ads)
+        result['pages_per_s'] = pages / elapsed
+        result['ads_per_s'] = len(ads) / elapsed
+
+        tracemalloc.start()
+        crawl(server, max_num_pages, options, parser)
+        result['peak_mib'] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+
+        contents = [server.page(n) for n in range(1, min(max_num_pages, 10) + 1)]
+
+    start = process_time()
+    for content in contents:
+        parse_page(content, parser)
+    result['parse_ms_per_page'] = (process_time() - start) / len(contents) * 1000
+
+    start = perf_counter()
+    if ads:
+        ads_to_dataframe(ads)
+    result['dataframe_s'] = perf_counter() - start
+    return result
+
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for scenario, metrics in results.items():
+        for metric, higher_is_better in METRICS.items():
+            old = baseline.get(scenario, {}).get(metric)
+            new = metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+                found.append(f"{scenario}.{metric}: {old:.3f} -> {new:.3f} ({change:+.0%})")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scenarios', nargs='*', help=f"scenarios to run, among {', '.join(SCENARIOS)} (default all)")
+    parser.add_argument('--latency', type=float, default=0.0, help='server latency per request, in seconds')
+    parser.add_argument('--concurrent', action='store_true')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--parser', default='json')
+    parser.add_argument('--output', type=Path, help='save the results as JSON')
+    parser.add_argument('--baseline', type=Path, help='JSON results of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios {', '.join(sorted(unknown))}")
+
+    # Retries of robots pages are expected in the robots scenario
+    logging.getLogger('SeLoger').setLevel(logging.ERROR)
+    options = {'concurrent': args.concurrent, 'workers': args.workers}
+    results = {}
+    header = f"{'scenario':<8} {'pages':>6} {'ads':>6} {'pages/s':>9} {'ads/s':>9} {'parse ms':>9} {'peak MiB':>9} {'df s':>7}"
+    print(header)
+    for name in args.scenarios or SCENARIOS:
+        num_results, max_num_pages, block_every = SCENARIOS[name]
+        result = run_scenario(num_results, max_num_pages, block_every, args.latency, options, args.parser)
+        results[name] = result
+        print(f"{name:<8} {result['pages']:>6} {result['ads']:>6} {result['pages_per_s']:>9.1f} "
+              f"{result['ads_per_s']:>9.1f} {result['parse_ms_per_page']:>9.2f} {result['peak_mib']:>9.1f} "
+              f"{result['dataframe_s']:>7.3f}")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        found = regressions(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
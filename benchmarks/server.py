@@ -0,0 +1,130 @@
+"""
+Local stand-in for seloger.com list.htm.
+
+Serves result pages for any query: page n is chosen with LISTING-LISTpg=n, like on the site.
+Recorded fixtures are served when a search name is given, generated pages otherwise.
+
+Usage:
+    python benchmarks/server.py --port 8000 --num-results 2000 --latency 0.05 --block-every 0
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from fixtures import ROBOTS_PAGE, make_page, recorded_pages
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    Parameters
+    ----------
+    port : int
+        0 picks a free port.
+    num_results : int
+        nbresults of the generated search.
+    latency : float
+        Seconds waited before answering each request.
+    block_every : int
+        Answer every n-th request with a robots page, 0 never.
+    fixture : str
+        Name of a recorded search under fixtures/, served instead of generated pages when recorded.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, num_results=2000, latency=0.0, block_every=0, fixture=None):
+        super(StandInServer, self).__init__(('127.0.0.1', port), _Handler)
+        self.num_results = num_results
+        self.latency = latency
+        self.block_every = block_every
+        self.recorded = recorded_pages(fixture) if fixture else {}
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pages = {}
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/list.htm?"
+
+    def page(self, page_num):
+        if page_num in self.recorded:
+            return self.recorded[page_num]
+        if page_num not in self._pages:
+            self._pages[page_num] = make_page(page_num, self.num_results)
+        return self._pages[page_num]
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        if url.path != '/list.htm':
+            self.send_error(404)
+            return
+
+        number = server.count_request()
+        if server.latency:
+            time.sleep(server.latency)
+
+        if server.block_every and number % server.block_every == 0:
+            body = ROBOTS_PAGE.encode('utf-8')
+        else:
+            page_num = int(parse_qs(url.query).get('LISTING-LISTpg', ['1'])[0])
+            body = server.page(page_num)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with server._lock:
+            server.bytes_sent += len(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--num-results', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--block-every', type=int, default=0)
+    parser.add_argument('--fixture')
+    args = parser.parse_args()
+
+    server = StandInServer(args.port, args.num_results, args.latency, args.block_every, args.fixture)
+    print(f"Serving on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()